@@ -1,11 +1,107 @@
 from typing import Dict, List
 from datamodel import OrderDepth, TradingState, Order
-import jsonpickle
+import json
+import math
 import numpy as np
 
 
+class RollingWindow:
+    """
+    Rolling mean and z-score of the basket spreads and SQUID_INK mids: the part of
+    rolling.RollingWindow this trader uses, copied since a submission is a single file
+    (tests/test_rolling.py keeps them in step). traderData holds the __getstate__ lists.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = []
+        self.head = 0  # index of the oldest value once the buffer is full
+        self.total = 0.0
+        self.m2 = 0.0
+
+    @property
+    def full(self):
+        return len(self.values) == self.window
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else 0.0
+
+    def push(self, value):
+        values = self.values
+        if len(values) < self.window:
+            old_mean = self.mean
+            values.append(value)
+            self.total += value
+            self.m2 += (value - old_mean) * (value - self.mean)
+            return
+        oldest = values[self.head]
+        values[self.head] = value
+        self.head += 1
+        if self.head == self.window:
+            # exact recompute once per pass, so rounding errors cannot build up
+            self.head = 0
+            self.total = math.fsum(values)
+            mean = self.mean
+            self.m2 = math.fsum((v - mean) ** 2 for v in values)
+            return
+        old_mean = self.mean
+        self.total += value - oldest
+        self.m2 += (value - oldest) * (value - self.mean + oldest - old_mean)
+
+    def zscore(self, eps=1e-6):
+        """z-score of the newest value against the window."""
+        last = self.values[self.head - 1] if self.full else self.values[-1]
+        std = math.sqrt(max(self.m2, 0.0) / len(self.values)) if self.values else 0.0
+        return (last - self.mean) / (std + eps)
+
+    def __getstate__(self):
+        return [self.window, self.head, self.total, self.m2, self.values]
+
+    @classmethod
+    def restore(cls, state):
+        window = cls.__new__(cls)
+        window.window, window.head, window.total, window.m2, window.values = state
+        return window
+
+
+def load_windows(traderData):
+    """traderData as written by dump_windows, back as {key: RollingWindow}."""
+    return {key: RollingWindow.restore(state) for key, state in json.loads(traderData).items()} if traderData else {}
+
+
+def dump_windows(windows):
+    """Plain JSON of each window's state; nothing the exchange would need this file's classes to decode."""
+    return json.dumps({key: window.__getstate__() for key, window in windows.items()}, separators=(",", ":"))
+
+
+BASKET_PRODUCTS = ["DJEMBES", "JAMS", "CROISSANTS", "PICNIC_BASKET1", "PICNIC_BASKET2"]
+
+# exchange position limits of the basket legs
+POSITION_LIMITS = {"DJEMBES": 60, "JAMS": 350, "CROISSANTS": 250, "PICNIC_BASKET1": 60, "PICNIC_BASKET2": 100}
+
+# PICNIC_BASKET1 against its synthetic: quantity of each leg per unit traded when PB1 is rich
+BASKET_A_LEGS = {"PICNIC_BASKET1": -1, "DJEMBES": 1, "JAMS": 3, "CROISSANTS": 6}
+
+
 class Trader:
 
+    def __init__(self, A_threshold=1.2, djembe_threshold=1.2, vol=5, window=3000):
+        # tunables of the basket arbitrage, see sweep.py for searching over them
+        self.A_threshold = A_threshold
+        self.djembe_threshold = djembe_threshold
+        self.vol = vol
+        self.window = window
+        # set by the backtester: return the state object as traderData instead of encoding it
+        self.passthrough = False
+
+    def decode_trader_data(self, traderData: str) -> dict:
+        """The state written by encode_trader_data (the backtester times both in fidelity mode)."""
+        return load_windows(traderData)
+
+    def encode_trader_data(self, data: dict) -> str:
+        return dump_windows(data)
+
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
         """
         Only method required. It takes all buy and sell orders for all symbols as an input,
@@ -15,10 +111,17 @@ class Trader:
         result = {}
 
         # load previous data
-        data = jsonpickle.decode(state.traderData) if state.traderData else {}
+        if not isinstance(state.traderData, str):
+            data = state.traderData  # handed back as is by the backtester in passthrough mode
+        else:
+            data = self.decode_trader_data(state.traderData)
+
+        result.update(self.basket_orders(state, data))
 
         # Iterate over all the keys (the available products) contained in the order dephts
         for product in state.order_depths.keys():
+            if product in BASKET_PRODUCTS:
+                continue  # traded together in basket_orders
             # Retrieve the Order Depth containing all the market BUY and SELL orders
             order_depth: OrderDepth = state.order_depths[product]
             # Initialize the list of Orders to be sent as an empty list
@@ -41,10 +144,10 @@ class Trader:
             print(f"mid_price: {mid_price}, position: {position}, best_bid: {best_bid}, best_ask: {best_ask}\n")
 
             if product == "SQUID_INK":
-                history = data.get("SQUID_INK", [])
-                if len(history) > 10:
-                    roll_mean = np.mean(history)
-                    history.pop(0)
+                # mean of the previous 11 mids
+                history = data.setdefault("SQUID_INK", RollingWindow(11))
+                if history.full:
+                    roll_mean = history.mean
 
                     # compare rolling mean with mid price and skew??
                     # skew depends on the position
@@ -64,8 +167,7 @@ class Trader:
                         print(f"SELL {ask_vol}x {ask_price}\n")
                     result[product] = orders
 
-                history.append(mid_price)
-                data["SQUID_INK"] = history
+                history.push(mid_price)
 
 
             elif product == "RAINFOREST_RESIN":
@@ -93,85 +195,10 @@ class Trader:
                 result[product] = orders
 
 
-            elif product in ["DJEMBES", "JAMS", "CROISSANTS", "PICNIC_BASKET1", "PICNIC_BASKET2"]:
-
-                mid_prices = {}
-                for p in ["DJEMBES", "JAMS", "CROISSANTS", "PICNIC_BASKET1", "PICNIC_BASKET2"]:
-                    od = state.order_depths.get(p)
-                    if od and od.buy_orders and od.sell_orders:
-                        mid_prices[p] = (min(od.sell_orders.keys()) + max(od.buy_orders.keys())) / 2
-
-                if all(k in mid_prices for k in ["DJEMBES", "JAMS", "CROISSANTS", "PICNIC_BASKET1", "PICNIC_BASKET2"]):
-                    synthetic_A = mid_prices["DJEMBES"] + 3 * mid_prices["JAMS"] + 6 * mid_prices["CROISSANTS"]
-                    synthetic_B = 2 * mid_prices["JAMS"] + 4 * mid_prices["CROISSANTS"]
-
-
-                    spread_A = mid_prices["PICNIC_BASKET1"] - synthetic_A
-                    spread_B = mid_prices["PICNIC_BASKET2"] - synthetic_B
-                    spread_djembe = mid_prices["PICNIC_BASKET1"] - 1.5 * mid_prices["PICNIC_BASKET2"] - mid_prices[
-                        "DJEMBES"]
-                    # spread_djembe = spread_A - 1.5 * spread_B
-
-                    for key, spread in zip(["spread_A", "spread_B", "spread_djembe"], [spread_A, spread_B, spread_djembe]):
-                        h = data.get(key, [])
-                        h.append(spread)
-                        if len(h) > 3000:
-                            h.pop(0)
-                        data[key] = h
-
-                    def calculate_z_score(series, window=3000):
-                        if len(series) < window:
-                            return 0
-                        return (series[-1] - np.mean(series[-window:])) / (np.std(series[-window:]) + 1e-6)
-
-                    z_A = calculate_z_score(data.get("spread_A", []))
-                    z_B = calculate_z_score(data.get("spread_B", []))
-                    z_pair = calculate_z_score(data.get("spread_djembe", []))
-
-                    A_threshold, djembe_threshold, vol = 1.2, 1.2, 5
-
-                    price_data = {}
-                    for p in ["DJEMBES", "JAMS", "CROISSANTS", "PICNIC_BASKET1"]:
-                        od = state.order_depths[p]
-                        if od.sell_orders:
-                            price_data[f"{p}_ask"] = min(od.sell_orders.keys())
-                        if od.buy_orders:
-                            price_data[f"{p}_bid"] = max(od.buy_orders.keys())
-
-                    # Trade basket A vs synthetic A
-                    if z_A > A_threshold:
-                        # PB1 is rich — short it, long synthetic
-                        orders.append(Order("PICNIC_BASKET1", price_data["PICNIC_BASKET1_bid"], -vol))
-                        orders.append(Order("DJEMBES", price_data["DJEMBES_ask"], +1 * vol))
-                        orders.append(Order("JAMS", price_data["JAMS_ask"], +3 * vol))
-                        orders.append(Order("CROISSANTS", price_data["CROISSANTS_ask"], +6 * vol))
-
-                    elif z_A < - A_threshold:
-                        # PB1 is cheap — long it, short synthetic
-                        orders.append(Order("PICNIC_BASKET1", price_data["PICNIC_BASKET1_ask"], +vol))
-                        orders.append(Order("DJEMBES", price_data["DJEMBES_bid"], -1 * vol))
-                        orders.append(Order("JAMS", price_data["JAMS_bid"], -3 * vol))
-                        orders.append(Order("CROISSANTS", price_data["CROISSANTS_bid"], -6 * vol))
-
-                    # Trade Djembe
-                    if z_pair > djembe_threshold:
-                        # DJEMBES is cheap — long it
-                        orders.append(Order("DJEMBES", price_data["DJEMBES_ask"], +vol))
-                    elif z_pair < -djembe_threshold:
-                        # DJEMBES is rich — short it
-                        orders.append(Order("DJEMBES", price_data["DJEMBES_bid"], -vol))
-                for order in orders:
-                    result.setdefault(order.product, []).append(order)
-
-
-
-
-
-
-        traderData = jsonpickle.encode(data)
+        traderData = data if self.passthrough else self.encode_trader_data(data)
         # String value holding Trader state data required. It will be delivered as TradingState.traderData on next execution.
 
-        conversions = 1
+        conversions = 0
 
         # Return the dict of orders
         # These possibly contain buy or sell orders
@@ -179,3 +206,63 @@ class Trader:
 
         return result, conversions, traderData
 
+    def basket_orders(self, state: TradingState, data: dict) -> Dict[str, List[Order]]:
+        """
+        Basket arbitrage, once per tick for all legs: PICNIC_BASKET1 against its synthetic (DJEMBES +
+        3 JAMS + 6 CROISSANTS), and DJEMBES against PICNIC_BASKET1 - 1.5 PICNIC_BASKET2.
+
+        The spreads are pushed to their rolling windows once per tick and the z-scores read off the
+        windows' running statistics. The quantities of both trades are netted per product and kept
+        within the position limits (the basket trade is scaled down as a whole, so its legs stay in
+        ratio), giving at most one order per product: a buy at the best ask or a sell at the best bid.
+        """
+        best_bids, best_asks, mid_prices = {}, {}, {}
+        for p in BASKET_PRODUCTS:
+            od = state.order_depths.get(p)
+            if not (od and od.buy_orders and od.sell_orders):
+                return {}
+            best_bids[p], best_asks[p] = max(od.buy_orders), min(od.sell_orders)
+            mid_prices[p] = (best_asks[p] + best_bids[p]) / 2
+
+        # (PICNIC_BASKET2 against its own synthetic is not traded, so its spread is not kept: every
+        # window adds its 3000 values to traderData)
+        synthetic_A = mid_prices["DJEMBES"] + 3 * mid_prices["JAMS"] + 6 * mid_prices["CROISSANTS"]
+        spreads = {
+            "spread_A": mid_prices["PICNIC_BASKET1"] - synthetic_A,
+            "spread_djembe": mid_prices["PICNIC_BASKET1"] - 1.5 * mid_prices["PICNIC_BASKET2"] - mid_prices["DJEMBES"],
+        }
+        z = {}
+        for key, spread in spreads.items():
+            window = data.setdefault(key, RollingWindow(self.window))
+            window.push(spread)
+            z[key] = window.zscore() if window.full else 0
+
+        position = {p: state.position.get(p, 0) for p in BASKET_PRODUCTS}
+        quantities = dict.fromkeys(BASKET_PRODUCTS, 0)
+
+        def capacity(product, quantity):
+            # how much of quantity (signed) fits within the limit on top of what is already planned
+            held = position[product] + quantities[product]
+            room = POSITION_LIMITS[product] - held if quantity > 0 else POSITION_LIMITS[product] + held
+            return max(room, 0)
+
+        # Trade basket A vs synthetic A: PB1 rich -> short it, long synthetic; PB1 cheap -> the reverse
+        direction = 1 if z["spread_A"] > self.A_threshold else -1 if z["spread_A"] < -self.A_threshold else 0
+        if direction:
+            units = min([self.vol] + [capacity(p, direction * w) // abs(w) for p, w in BASKET_A_LEGS.items()])
+            for p, weight in BASKET_A_LEGS.items():
+                quantities[p] += direction * weight * units
+
+        # Trade Djembe: cheap against the baskets -> long it, rich -> short it
+        if z["spread_djembe"] > self.djembe_threshold:
+            quantities["DJEMBES"] += min(self.vol, capacity("DJEMBES", 1))
+        elif z["spread_djembe"] < -self.djembe_threshold:
+            quantities["DJEMBES"] -= min(self.vol, capacity("DJEMBES", -1))
+
+        orders = {}
+        for p, quantity in quantities.items():
+            if quantity > 0:
+                orders[p] = [Order(p, best_asks[p], quantity)]
+            elif quantity < 0:
+                orders[p] = [Order(p, best_bids[p], quantity)]
+        return orders
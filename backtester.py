@@ -1,133 +1,320 @@
 import datetime
-import json
+import os
+import pickle
+import re
+import time
+import jsonpickle
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from typing import List, Dict, Any
+from typing import List, Dict
 from datamodel import TradingState, Listing, OrderDepth, Trade, Observation
+from ledger import PnLLedger
+from logs import LogWriter, TradeLog
+from marks import mark_grid
+from profiling import TickProfiler
+from tickstream import (BookCopies, CompiledObservations, CompiledPrices, CompiledTrades, copy_order_depths,
+                        read_only_order_depths)
+
+# longest traderData string the exchange keeps between runs
+TRADER_DATA_LIMIT = 50000
+
+TRADER_DATA_MODES = ("serialize", "passthrough", "fidelity")
+
+
+# Backtester attributes that change while it runs, i.e. what a checkpoint has to save
+CHECKPOINT_FIELDS = ("tick", "trader_data", "own_trades", "market_trades", "trade_remaining",
+                     "current_position", "ledger", "pnl", "cash", "trades", "sandbox_logs", "trader_data_stats")
+CHECKPOINT_FILE = re.compile(r"checkpoint_(-?\d+)\.pkl$")
+
 
 class Backtester:
     def __init__(self, trader, listings: Dict[str, Listing], position_limit: Dict[str, int], fair_marks,
-                 market_data: pd.DataFrame, trade_history: pd.DataFrame, file_name: str = None):
+                 market_data: pd.DataFrame, trade_history: pd.DataFrame, file_name: str = None,
+                 prices: CompiledPrices = None, trades: CompiledTrades = None, log_indent: int = 2,
+                 trader_data_mode: str = "serialize", profile: bool = False, trader_budget_ms: float = 900.0,
+                 observations: CompiledObservations = None):
+        # Already compiled prices/trades can be passed instead of the DataFrames, e.g. from a sweep
+        # that compiles each day once. market_data is still needed to write a log file.
+        # log_indent=None writes compact JSON into the log file.
+        #
+        # trader_data_mode:
+        #   "serialize"   traderData is handed back exactly as the trader returned it (normally a string)
+        #   "passthrough" traders with a passthrough attribute return their state object itself, which is
+        #                 handed back on the next tick without any encoding
+        #   "fidelity"    traders serialise their state themselves, as for the exchange, and the payload
+        #                 size per tick is recorded in trader_data_stats; its encode/decode time is recorded
+        #                 too when the trader has decode_trader_data(str) and encode_trader_data(state)
+        #                 methods, which are timed on the string it returned. A state object returned by a
+        #                 trader without a passthrough attribute is round-tripped through jsonpickle.
+        #
+        # profile=True times every phase of every tick into self.profiler (see profiling.TickProfiler)
+        # and flags ticks where Trader.run takes longer than trader_budget_ms in the sandbox log.
+        #
+        # observations (e.g. Catalog.load_observations) feeds state.observations; without them every
+        # tick gets an empty Observation and conversion requests are ignored.
+        if trader_data_mode not in TRADER_DATA_MODES:
+            raise ValueError(f"trader_data_mode must be one of {TRADER_DATA_MODES}")
         self.trader = trader
         self.listings = listings
         self.market_data = market_data
+        self.prices = prices if prices is not None else CompiledPrices.from_dataframe(market_data)
         self.position_limit = position_limit
         self.fair_marks = fair_marks
-        self.trade_history = trade_history.sort_values(by=['timestamp', 'symbol'])
+        # marks that can be computed up front are looked up by (tick, product column), see marks.py
+        grid, self.tick_marks = mark_grid(self.prices, fair_marks)
+        self.marks = grid.tolist()
+        self.trade_history = trade_history
+        self.trade_tape = trades if trades is not None else CompiledTrades.from_dataframe(trade_history)
         self.file_name = file_name
-
-        self.observations = [Observation({}, {}) for _ in range(len(market_data))]
+        self.log_indent = log_indent
+        self.trader_data_mode = trader_data_mode
+        self.profile = profile
+        self.trader_budget_ms = trader_budget_ms
+        if hasattr(trader, "passthrough"):
+            trader.passthrough = trader_data_mode == "passthrough"
+
+        self.observations = observations
+        self._no_observation = Observation({}, {})
+
+        self.start()
+
+    def start(self):
+        """Reset the backtest to before its first tick."""
+        self.tick = 0
+        self.trader_data = ""
+        # trades of the previous tick, handed to the trader as the exchange does
+        self.own_trades = {}
+        self.market_trades = {}
+        # volume of each market print not yet taken by our orders
+        self.trade_remaining = self.trade_tape.quantities.tolist()
 
         self.current_position = {product: 0 for product in self.listings.keys()}
-        self.pnl_history = []
+        self.ledger = PnLLedger(self.prices.tick_timestamps, self.prices.products)
         self.pnl = {product: 0 for product in self.listings.keys()}
         self.cash = {product: 0 for product in self.listings.keys()}
-        self.trades = []
+        self.trades = TradeLog()
         self.sandbox_logs = []
-
-    def run(self):
-        traderData = ""
-
-        timestamp_group_md = self.market_data.groupby('timestamp')
-        timestamp_group_th = self.trade_history.groupby('timestamp')
-
-        own_trades = defaultdict(list)
-        market_trades = defaultdict(list)
-        pnl_product = defaultdict(float)
-
-        trade_history_dict = {}
-
-        for timestamp, group in timestamp_group_th:
-            trades = []
-            for _, row in group.iterrows():
-                symbol = row['symbol']
-                price = row['price']
-                quantity = row['quantity']
-                buyer = row['buyer'] if pd.notnull(row['buyer']) else ""
-                seller = row['seller'] if pd.notnull(row['seller']) else ""
-
-                trade = Trade(symbol, int(price), int(quantity), buyer, seller, timestamp)
-
-                trades.append(trade)
-            trade_history_dict[timestamp] = trades
-
-        for timestamp, group in timestamp_group_md:
-            order_depths = self._construct_order_depths(group)
-            order_depths_matching = self._construct_order_depths(group)
-            order_depths_pnl = self._construct_order_depths(group)
-            state = self._construct_trading_state(traderData, timestamp, self.listings, order_depths,
-                                                  dict(own_trades), dict(market_trades), self.current_position,
-                                                  self.observations)
-            orders, conversions, traderData = self.trader.run(state)
-            products = group['product'].tolist()
-            sandboxLog = ""
-            trades_at_timestamp = trade_history_dict.get(timestamp, [])
-
-            for product in products:
-                new_trades = []
-                for order in orders.get(product, []):
-                    trades_done, sandboxLog = self._execute_order(timestamp, order, order_depths_matching,
-                                                                  self.current_position, self.cash, trade_history_dict,
-                                                                  sandboxLog)
-                    new_trades.extend(trades_done)
-                if len(new_trades) > 0:
-                    own_trades[product] = new_trades
-            self.sandbox_logs.append({"sandboxLog": sandboxLog, "lambdaLog": "", "timestamp": timestamp})
-
-            trades_at_timestamp = trade_history_dict.get(timestamp, [])
-            if trades_at_timestamp:
-                for trade in trades_at_timestamp:
-                    product = trade.symbol
-                    market_trades[product].append(trade)
-            else:
-                for product in products:
-                    market_trades[product] = []
-
-            for product in products:
-                self._mark_pnl(self.cash, self.current_position, order_depths_pnl, self.pnl, product)
-                self.pnl_history.append(self.pnl[product])
-            self._add_trades(own_trades, market_trades)
-        return self._log_trades(self.file_name)
+        # fidelity mode only: timestamp, payload bytes, encode and decode seconds per tick
+        self.trader_data_stats = {"timestamp": [], "bytes": [], "encode_time": [], "decode_time": []}
+        self.profiler = TickProfiler(self.prices.tick_timestamps, self.trader_budget_ms) if self.profile else None
+
+    def run(self, checkpoint_dir: str = None, checkpoint_every: int = 1000):
+        """
+        Run the remaining ticks (all of them, or the ones after a checkpoint loaded with resume), write
+        the log file and return the ledger summary.
+
+        With checkpoint_dir set, the full state is saved there before every checkpoint_every-th tick.
+        """
+        timestamps = self.prices.tick_timestamps
+        while self.tick < len(self.prices):
+            if checkpoint_dir is not None and self.tick % checkpoint_every == 0:
+                self.save_checkpoint(os.path.join(checkpoint_dir, f"checkpoint_{int(timestamps[self.tick])}.pkl"))
+            self._step()
+        return self.finish()
+
+    def _step(self, book: Dict[str, OrderDepth] = None, copy_book: bool = True):
+        if self.profiler is not None:
+            return self._profiled_step(book, copy_book)
+        tick = self.tick
+        timestamp, products, order_depths_pnl, observation, state = self._open_tick(tick, book, copy_book)
+        orders, conversions, traderData = self.trader.run(state)
+        own_trades, sandboxLog = self._match(tick, timestamp, products, orders, conversions, order_depths_pnl,
+                                             observation, "")
+        if self.trader_data_mode == "fidelity":
+            traderData, sandboxLog = self._round_trip_trader_data(timestamp, traderData, sandboxLog)
+        market_trades = self._tick_market_trades(timestamp)
+        self._mark_tick(tick, products, order_depths_pnl)
+        self._close_tick(timestamp, sandboxLog, traderData, own_trades, market_trades)
+
+    def _profiled_step(self, book: Dict[str, OrderDepth], copy_book: bool):
+        # _step with the clock read between its phases (profiling.PHASES)
+        tick, profiler, clock = self.tick, self.profiler, time.perf_counter_ns
+        book_start = clock()
+        timestamp, products, order_depths_pnl, observation, state = self._open_tick(tick, book, copy_book)
+        trader_start = clock()
+        orders, conversions, traderData = self.trader.run(state)
+        matching_start = clock()
+        sandboxLog = ""
+        if matching_start - trader_start > profiler.trader_budget_ms * 1e6:
+            sandboxLog += (f"\nTrader.run took {(matching_start - trader_start) / 1e6:.1f} ms, "
+                           f"over the budget of {profiler.trader_budget_ms:g} ms")
+        own_trades, sandboxLog = self._match(tick, timestamp, products, orders, conversions, order_depths_pnl,
+                                             observation, sandboxLog)
+        trader_data_start = clock()
+        if self.trader_data_mode == "fidelity":
+            traderData, sandboxLog = self._round_trip_trader_data(timestamp, traderData, sandboxLog)
+        market_trades_start = clock()
+        market_trades = self._tick_market_trades(timestamp)
+        mark_start = clock()
+        self._mark_tick(tick, products, order_depths_pnl)
+        log_start = clock()
+        self._close_tick(timestamp, sandboxLog, traderData, own_trades, market_trades)
+        profiler.record(tick, (book_start, trader_start, matching_start, trader_data_start,
+                               market_trades_start, mark_start, log_start, clock()))
+
+    def _open_tick(self, tick: int, book: Dict[str, OrderDepth], copy_book: bool):
+        timestamp = int(self.prices.tick_timestamps[tick])
+        if book is None:
+            order_depths = self.prices.order_depths(tick)
+            order_depths_pnl = copy_order_depths(order_depths)
+        else:
+            # this tick's books, shared with other backtesters and never changed here
+            order_depths = copy_order_depths(book) if copy_book else dict(book)
+            order_depths_pnl = book
+        observation = (self.observations.observation(timestamp) if self.observations is not None
+                       else self._no_observation)
+        state = self._construct_trading_state(self.trader_data, timestamp, self.listings, order_depths,
+                                              self.own_trades, self.market_trades, self.current_position,
+                                              observation)
+        return timestamp, self.prices.tick_products(tick), order_depths_pnl, observation, state
+
+    def _match(self, tick, timestamp, products, orders, conversions, order_depths_pnl, observation, sandboxLog):
+        # copied from the untouched books when the first order for a product is matched
+        order_depths_matching = BookCopies(order_depths_pnl)
+        own_trades = {}
+        for product in products:
+            new_trades = []
+            for order in orders.get(product, []):
+                trades_done, sandboxLog = self._execute_order(timestamp, order, order_depths_matching,
+                                                              self.current_position, self.cash, sandboxLog)
+                new_trades.extend(trades_done)
+            if len(new_trades) > 0:
+                own_trades[product] = new_trades
+                self.ledger.record_fills(tick, product, new_trades)
+        if conversions and self.observations is not None:
+            sandboxLog = self._convert(tick, timestamp, conversions, observation, sandboxLog)
+        return own_trades, sandboxLog
+
+    def _tick_market_trades(self, timestamp) -> Dict[str, List[Trade]]:
+        market_trades = {}
+        for trade in self._remaining_market_trades(timestamp):
+            market_trades.setdefault(trade.symbol, []).append(trade)
+        return market_trades
+
+    def _mark_tick(self, tick, products, order_depths_pnl):
+        for product in products:
+            self._mark_pnl(tick, self.cash, self.current_position, order_depths_pnl, self.pnl, product)
+
+    def _close_tick(self, timestamp, sandboxLog, traderData, own_trades, market_trades):
+        self.sandbox_logs.append({"sandboxLog": sandboxLog, "lambdaLog": "", "timestamp": timestamp})
+        self._add_trades(own_trades, market_trades)
+        self.trader_data, self.own_trades, self.market_trades = traderData, own_trades, market_trades
+        self.tick += 1
+
+    def finish(self) -> pd.DataFrame:
+        self._log_trades(self.file_name)
+        return self.ledger.summary()
+
+    def save_checkpoint(self, path: str):
+        """Pickle everything the remaining ticks depend on, including the trader's attributes."""
+        state = {field: getattr(self, field) for field in CHECKPOINT_FIELDS}
+        state["timestamp"] = int(self.prices.tick_timestamps[self.tick]) if self.tick < len(self.prices) else None
+        state["trader"] = getattr(self.trader, "__dict__", {})
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def load_checkpoint(self, path: str):
+        """
+        Restore a state saved by save_checkpoint; the next run continues from there.
+
+        The saved attributes are copied onto the current trader object, so a trader whose code has
+        changed since the checkpoint was written resumes with its old state and its new logic.
+        """
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        timestamp = state["timestamp"]
+        if (len(self.prices) if timestamp is None else self.prices.tick_at(timestamp)) != state["tick"]:
+            raise ValueError(f"checkpoint {path} was saved on different price data")
+        for field in CHECKPOINT_FIELDS:
+            setattr(self, field, state[field])
+        if hasattr(self.trader, "__dict__"):
+            self.trader.__dict__.update(state["trader"])
+            if hasattr(self.trader, "passthrough"):
+                self.trader.passthrough = self.trader_data_mode == "passthrough"
+
+    def resume(self, checkpoint_dir: str, timestamp: int = None) -> int:
+        """
+        Load the latest checkpoint in checkpoint_dir saved at or before timestamp (default: the latest
+        of all) and return the timestamp the backtest will continue from.
+        """
+        saved = sorted((int(match.group(1)), name) for name in os.listdir(checkpoint_dir)
+                       for match in [CHECKPOINT_FILE.match(name)] if match)
+        if timestamp is not None:
+            saved = [entry for entry in saved if entry[0] <= timestamp]
+        if not saved:
+            raise FileNotFoundError(f"no checkpoint in {checkpoint_dir} at or before timestamp {timestamp}")
+        self.load_checkpoint(os.path.join(checkpoint_dir, saved[-1][1]))
+        return saved[-1][0]
+
+    def _round_trip_trader_data(self, timestamp, traderData, sandboxLog):
+        encode_time = decode_time = float("nan")
+        if isinstance(traderData, str):
+            # the trader serialised the state itself; its own decode and encode are timed if it has them
+            encoded = traderData
+            trader = self.trader
+            if hasattr(trader, "decode_trader_data") and hasattr(trader, "encode_trader_data"):
+                start = time.perf_counter()
+                decoded = trader.decode_trader_data(encoded)
+                decoded_at = time.perf_counter()
+                trader.encode_trader_data(decoded)
+                decode_time, encode_time = decoded_at - start, time.perf_counter() - decoded_at
+        else:
+            start = time.perf_counter()
+            encoded = jsonpickle.encode(traderData)
+            encoded_at = time.perf_counter()
+            traderData = jsonpickle.decode(encoded)
+            encode_time, decode_time = encoded_at - start, time.perf_counter() - encoded_at
+
+        size = len(encoded.encode("utf-8"))
+        stats = self.trader_data_stats
+        stats["timestamp"].append(timestamp)
+        stats["bytes"].append(size)
+        stats["encode_time"].append(encode_time)
+        stats["decode_time"].append(decode_time)
+        if len(encoded) > TRADER_DATA_LIMIT:
+            sandboxLog += f"\ntraderData of {len(encoded)} characters exceeds the limit of {TRADER_DATA_LIMIT}"
+        return traderData, sandboxLog
+
+    @property
+    def pnl_history(self) -> np.ndarray:
+        """PnL of each market_data row (one per timestamp and product), in the DataFrame's row order."""
+        prices = self.prices
+        ticks = np.repeat(np.arange(len(prices)), np.diff(prices.tick_starts))
+        history = np.empty(len(prices.timestamps))
+        history[prices.row_index] = self.ledger.pnl[ticks, prices.product_ids]
+        return history
+
+    def trader_data_report(self) -> pd.DataFrame:
+        """
+        Per-tick traderData size and serialisation time recorded in fidelity mode. The time columns
+        are left out when the trader's serialisation could not be timed.
+        """
+        report = pd.DataFrame(self.trader_data_stats)
+        return report.dropna(axis="columns", how="all") if len(report) else report
 
     def _log_trades(self, filename: str = None):
         if filename is None:
             return
 
-        self.market_data['profit_and_loss'] = self.pnl_history
-
-        output = ""
-        output += "Sandbox logs:\n"
-        for i in self.sandbox_logs:
-            output += json.dumps(i, indent=2) + "\n"
-
-        output += "\n\n\n\nActivities log:\n"
-        market_data_csv = self.market_data.to_csv(index=False, sep=";")
-        market_data_csv = market_data_csv.replace("\r\n", "\n")
-        output += market_data_csv
+        with LogWriter(filename, indent=self.log_indent) as writer:
+            self.write_log(writer)
 
-        output += "\n\n\n\nTrade History:\n"
-        output += json.dumps(self.trades, indent=2)
-
-        with open(filename, 'w') as file:
-            file.write(output)
+    def write_log(self, writer: LogWriter):
+        """Write the sandbox logs, market_data with a profit_and_loss column, and the trades to writer."""
+        self.market_data['profit_and_loss'] = self.pnl_history
+        writer.write_sandbox_logs(self.sandbox_logs)
+        writer.write_activities(self.market_data)
+        writer.write_trades(self.trades)
 
     def _add_trades(self, own_trades: Dict[str, List[Trade]], market_trades: Dict[str, List[Trade]]):
-        products = set(own_trades.keys()) | set(market_trades.keys())
+        # called once per tick with only that tick's trades, so each trade is logged exactly once
+        products = dict.fromkeys([*own_trades, *market_trades])
         for product in products:
-            self.trades.extend([self._trade_to_dict(trade) for trade in own_trades.get(product, [])])
+            self.trades.extend(own_trades.get(product, []))
         for product in products:
-            self.trades.extend([self._trade_to_dict(trade) for trade in market_trades.get(product, [])])
-
-    def _trade_to_dict(self, trade: Trade) -> dict[str, Any]:
-        return {
-            "timestamp": trade.timestamp,
-            "buyer": trade.buyer,
-            "seller": trade.seller,
-            "symbol": trade.symbol,
-            "currency": "SEASHELLS",
-            "price": trade.price,
-            "quantity": trade.quantity,
-        }
+            self.trades.extend(market_trades.get(product, []))
 
     def _construct_trading_state(self, traderData, timestamp, listings, order_depths,
                                  own_trades, market_trades, position, observations):
@@ -135,26 +322,7 @@ class Backtester:
                              own_trades, market_trades, position, observations)
         return state
 
-    def _construct_order_depths(self, group):
-        order_depths = {}
-        for idx, row in group.iterrows():
-            product = row['product']
-            order_depth = OrderDepth()
-            for i in range(1, 4):
-                if f'bid_price_{i}' in row and f'bid_volume_{i}' in row:
-                    bid_price = row[f'bid_price_{i}']
-                    bid_volume = row[f'bid_volume_{i}']
-                    if not pd.isna(bid_price) and not pd.isna(bid_volume):
-                        order_depth.buy_orders[int(bid_price)] = int(bid_volume)
-                if f'ask_price_{i}' in row and f'ask_volume_{i}' in row:
-                    ask_price = row[f'ask_price_{i}']
-                    ask_volume = row[f'ask_volume_{i}']
-                    if not pd.isna(ask_price) and not pd.isna(ask_volume):
-                        order_depth.sell_orders[int(ask_price)] = -int(ask_volume)
-            order_depths[product] = order_depth
-        return order_depths
-
-    def _execute_buy_order(self, timestamp, order, order_depths, position, cash, trade_history_dict, sandboxLog):
+    def _execute_buy_order(self, timestamp, order, order_depths, position, cash, sandboxLog):
         trades = []
         order_depth = order_depths[order.symbol]
 
@@ -175,35 +343,26 @@ class Backtester:
             if order_depth.sell_orders[price] == 0:
                 del order_depth.sell_orders[price]
 
-        trades_at_timestamp = trade_history_dict.get(timestamp, [])
-        new_trades_at_timestamp = []
-        for trade in trades_at_timestamp:
-            if trade.symbol == order.symbol:
-                if trade.price < order.price:
-                    trade_volume = min(abs(order.quantity), abs(trade.quantity))
-                    trades.append(Trade(order.symbol, order.price, trade_volume, "SUBMISSION", "", timestamp))
-                    order.quantity -= trade_volume
-                    position[order.symbol] += trade_volume
-                    self.cash[order.symbol] -= order.price * trade_volume
-                    if trade_volume == abs(trade.quantity):
-                        continue
-                    else:
-                        new_quantity = trade.quantity - trade_volume
-                        new_trades_at_timestamp.append(
-                            Trade(order.symbol, order.price, new_quantity, "", "", timestamp))
-                        continue
-            new_trades_at_timestamp.append(trade)
-
-        if len(new_trades_at_timestamp) > 0:
-            trade_history_dict[timestamp] = new_trades_at_timestamp
+        remaining = self.trade_remaining
+        prices = self.trade_tape.columns()[1]
+        for row in self.trade_tape.rows_for(timestamp, order.symbol):
+            if order.quantity == 0:
+                break
+            if remaining[row] > 0 and prices[row] < order.price:
+                trade_volume = min(abs(order.quantity), remaining[row])
+                trades.append(Trade(order.symbol, order.price, trade_volume, "SUBMISSION", "", timestamp))
+                order.quantity -= trade_volume
+                position[order.symbol] += trade_volume
+                self.cash[order.symbol] -= order.price * trade_volume
+                remaining[row] -= trade_volume
 
         return trades, sandboxLog
 
-    def _execute_sell_order(self, timestamp, order, order_depths, position, cash, trade_history_dict, sandboxLog):
+    def _execute_sell_order(self, timestamp, order, order_depths, position, cash, sandboxLog):
         trades = []
         order_depth = order_depths[order.symbol]
 
-        for price, volume in sorted(order_depth.buy_orders.items(), reverse=True):
+        for price, volume in list(order_depth.buy_orders.items()):
             if price < order.price or order.quantity == 0:
                 break
 
@@ -220,51 +379,120 @@ class Backtester:
             if order_depth.buy_orders[price] == 0:
                 del order_depth.buy_orders[price]
 
-        trades_at_timestamp = trade_history_dict.get(timestamp, [])
-        new_trades_at_timestamp = []
-        for trade in trades_at_timestamp:
-            if trade.symbol == order.symbol:
-                if trade.price > order.price:
-                    trade_volume = min(abs(order.quantity), abs(trade.quantity))
-                    trades.append(Trade(order.symbol, order.price, trade_volume, "", "SUBMISSION", timestamp))
-                    order.quantity += trade_volume
-                    position[order.symbol] -= trade_volume
-                    self.cash[order.symbol] += order.price * trade_volume
-                    if trade_volume == abs(trade.quantity):
-                        continue
-                    else:
-                        new_quantity = trade.quantity - trade_volume
-                        new_trades_at_timestamp.append(
-                            Trade(order.symbol, order.price, new_quantity, "", "", timestamp))
-                        continue
-            new_trades_at_timestamp.append(trade)
-
-        if len(new_trades_at_timestamp) > 0:
-            trade_history_dict[timestamp] = new_trades_at_timestamp
+        remaining = self.trade_remaining
+        prices = self.trade_tape.columns()[1]
+        for row in self.trade_tape.rows_for(timestamp, order.symbol):
+            if order.quantity == 0:
+                break
+            if remaining[row] > 0 and prices[row] > order.price:
+                trade_volume = min(abs(order.quantity), remaining[row])
+                trades.append(Trade(order.symbol, order.price, trade_volume, "", "SUBMISSION", timestamp))
+                order.quantity += trade_volume
+                position[order.symbol] -= trade_volume
+                self.cash[order.symbol] += order.price * trade_volume
+                remaining[row] -= trade_volume
 
         return trades, sandboxLog
 
-    def _execute_order(self, timestamp, order, order_depths, position, cash, trades_at_timestamp, sandboxLog):
+    def _execute_order(self, timestamp, order, order_depths, position, cash, sandboxLog):
         if order.quantity == 0:
-            return []
+            return [], sandboxLog
 
-        order_depth = order_depths[order.symbol]
         if order.quantity > 0:
-            return self._execute_buy_order(timestamp, order, order_depths, position, cash, trades_at_timestamp,
-                                           sandboxLog)
+            return self._execute_buy_order(timestamp, order, order_depths, position, cash, sandboxLog)
         else:
-            return self._execute_sell_order(timestamp, order, order_depths, position, cash, trades_at_timestamp,
-                                            sandboxLog)
-
-    def _mark_pnl(self, cash, position, order_depths, pnl, product):
-        order_depth = order_depths[product]
-
-        best_ask = min(order_depth.sell_orders.keys())
-        best_bid = max(order_depth.buy_orders.keys())
-        mid = (best_ask + best_bid) / 2
-        fair = mid
-        if product in self.fair_marks:
-            get_fair = self.fair_marks[product]
-            fair = get_fair(order_depth)
+            return self._execute_sell_order(timestamp, order, order_depths, position, cash, sandboxLog)
+
+    def _convert(self, tick, timestamp, conversions, observation, sandboxLog):
+        # conversions > 0 buys from the conversion counterparty at askPrice + transportFees + importTariff,
+        # < 0 sells at bidPrice - transportFees - exportTariff; either only to bring the position towards 0
+        product = self.observations.product
+        quote = observation.conversionObservations.get(product)
+        if quote is None:
+            return sandboxLog
+        position = self.current_position.get(product, 0)
+        if position == 0:
+            return sandboxLog  # nothing to convert, not worth a line on every tick
+        if conversions * position > 0:
+            return sandboxLog + f"\nConversion of {conversions} {product} ignored: conversions can only reduce the position of {position}"
+        if abs(conversions) > abs(position):
+            sandboxLog += f"\nConversion of {conversions} {product} reduced to {-position} to flatten the position"
+            conversions = -position
+
+        if conversions > 0:
+            price = quote.askPrice + quote.transportFees + quote.importTariff
+        else:
+            price = quote.bidPrice - quote.transportFees - quote.exportTariff
+        self.current_position[product] = position + conversions
+        self.cash[product] = self.cash.get(product, 0) - price * conversions
+        if product in self.ledger.product_index:
+            self.ledger.record_fills(tick, product, [Trade(product, price, abs(conversions), "", "", timestamp)])
+        return sandboxLog
+
+    def _remaining_market_trades(self, timestamp) -> List[Trade]:
+        """Market prints at timestamp with whatever volume our orders left of them."""
+        remaining = self.trade_remaining
+        return [self.trade_tape.trade(row, remaining[row])
+                for row in self.trade_tape.rows_for(timestamp) if remaining[row] > 0]
+
+    def _mark_pnl(self, tick, cash, position, order_depths, pnl, product):
+        get_fair = self.tick_marks.get(product)
+        if get_fair is not None:
+            fair = get_fair(order_depths[product])
+        else:
+            fair = self.marks[tick][self.ledger.product_index[product]]
 
         pnl[product] = cash[product] + fair * position[product]
+        self.ledger.record(tick, product, cash[product], position[product], fair)
+
+
+class LockstepBacktester:
+    """
+    Several traders backtested in one pass over the same prices and trades.
+
+    Each trader gets its own Backtester (positions, cash, traderData, remaining trade tape, logs),
+    all over the same compiled data, and they are stepped tick by tick together. A tick's books
+    are built once. By default every trader gets its own copy of them, so a trader that changes
+    state.order_depths affects only itself, as in a separate run. With copy_books=False all traders
+    share one read-only set instead, which is faster; changing it raises a TypeError. Matching and
+    marking always work from the untouched books.
+
+    Example:
+
+        lockstep = LockstepBacktester({f"window_{w}": Trader(window=w) for w in (1000, 2000, 3000)},
+                                      listings, position_limit, fair_marks, market_data, trade_history)
+        summary = lockstep.run()
+        print(summary.xs("TOTAL", level="product"))
+    """
+
+    def __init__(self, traders, listings: Dict[str, Listing], position_limit: Dict[str, int], fair_marks,
+                 market_data: pd.DataFrame, trade_history: pd.DataFrame, file_names: Dict[str, str] = None,
+                 prices: CompiledPrices = None, trades: CompiledTrades = None, copy_books: bool = True,
+                 **backtester_options):
+        # traders is a dict of name -> trader, or a list (named trader_0, trader_1, ...). file_names
+        # optionally maps names to log files; other keyword arguments are passed on to every Backtester.
+        if not isinstance(traders, dict):
+            traders = {f"trader_{i}": trader for i, trader in enumerate(traders)}
+        self.prices = prices if prices is not None else CompiledPrices.from_dataframe(market_data)
+        self.trade_tape = trades if trades is not None else CompiledTrades.from_dataframe(trade_history)
+        self.copy_books = copy_books
+        file_names = file_names or {}
+        self.backtesters = {
+            name: Backtester(trader, listings, position_limit, fair_marks,
+                             market_data.copy() if name in file_names else market_data, trade_history,
+                             file_names.get(name), prices=self.prices, trades=self.trade_tape,
+                             **backtester_options)
+            for name, trader in traders.items()
+        }
+
+    def run(self) -> pd.DataFrame:
+        """Run every trader over all ticks; returns their ledger summaries indexed by (trader, product)."""
+        backtesters = list(self.backtesters.values())
+        for tick in range(len(self.prices)):
+            book = self.prices.order_depths(tick)
+            if not self.copy_books:
+                book = read_only_order_depths(book)
+            for backtester in backtesters:
+                backtester._step(book, self.copy_books)
+        return pd.concat({name: backtester.finish() for name, backtester in self.backtesters.items()},
+                         names=["trader"])
@@ -1,37 +1,24 @@
-import datetime
-import json
+import argparse
+import contextlib
+import importlib
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple
+
 import pandas as pd
-from collections import defaultdict
-from typing import List, Dict, Any
-import string
-import jsonpickle
-import numpy as np
-import math
-import io
-from datamodel import Listing, ConversionObservation
-from datamodel import TradingState, Listing, OrderDepth, Trade, Observation
-from round2_justPB import Trader
+
+from datamodel import Listing
 from backtester import Backtester
-import pandas as pd
-import numpy as np
-from typing import List, Dict, Any
-import string
-import jsonpickle
-import numpy as np
-import math
+from datasets import Catalog
+from logs import read_log
+from marks import VectorizedMark
+from multiday import MultiDayBacktester
+
 
 def _process_data_(file):
-    with open(file, 'r') as file:
-        log_content = file.read()
-    sections = log_content.split('Sandbox logs:')[1].split('Activities log:')
-    sandbox_log =  sections[0].strip()
-    activities_log = sections[1].split('Trade History:')[0]
-    # sandbox_log_list = [json.loads(line) for line in sandbox_log.split('\n')]
-    trade_history =  json.loads(sections[1].split('Trade History:')[1])
-    # sandbox_log_df = pd.DataFrame(sandbox_log_list)
-    market_data_df = pd.read_csv(io.StringIO(activities_log), sep=";", header=0)
-    trade_history_df = pd.json_normalize(trade_history)
-    return market_data_df, trade_history_df
+    # memory-mapped, streaming parse; see logs.read_log
+    return read_log(file)
 
 listings = {
     'RAINFOREST_RESIN': Listing(symbol='RAINFOREST_RESIN', product='RAINFOREST_RESIN', denomination='SEASHELLS'),
@@ -58,13 +45,183 @@ position_limit = {
 fair_calculations = {
 }
 
-for i in range(1, 2):
-    # with fair prediction
-    day = i
-    market_data = pd.read_csv(f"R2Data/prices_round_2_day_{day}.csv", sep=";", header=0)
-    trade_history = pd.read_csv(f"R2Data/trades_round_2_day_{day}.csv", sep=";", header=0)
 
-    trader = Trader()
-    backtester = Backtester(trader, listings, position_limit, fair_calculations, market_data, trade_history, f"clean_data_logs/trade_history_day_{i}.log")
-    backtester.run()
-    print(backtester.pnl)
\ No newline at end of file
+def load_trader_class(strategy: str):
+    """
+    Resolve a strategy spec to its Trader class.
+
+    A spec is a module name or a path to a .py file, optionally followed by ":ClassName" (default
+    Trader), e.g. "Round2", "Round2:Trader" or "example-program.py". File paths make modules that are
+    not importable by name (such as example-program.py) usable too.
+    """
+    module_name, _, class_name = strategy.partition(":")
+    if module_name.endswith(".py"):
+        name = os.path.splitext(os.path.basename(module_name))[0].replace("-", "_")
+        spec = importlib.util.spec_from_file_location(name, module_name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name or "Trader")
+
+
+def strategy_name(strategy: str) -> str:
+    module_name, _, class_name = strategy.partition(":")
+    name = os.path.splitext(os.path.basename(module_name))[0]
+    return f"{name}.{class_name}" if class_name else name
+
+
+@contextlib.contextmanager
+def silenced(quiet: bool = True):
+    """Send stdout (the traders' prints) to os.devnull inside the block if quiet is set."""
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def run_day(day: int, strategy: str, round_number: int = 2, data_dir: str = ".",
+            log_dir: str = "clean_data_logs", quiet: bool = False, log_indent: int = 2,
+            trader_data_mode: str = "serialize", profile: bool = False) -> Dict[str, Any]:
+    """
+    Backtest one strategy on one day and return what the parent needs to summarise the run.
+
+    Data is looked up in data_dir, a directory or data bottle zip (see datasets.Catalog). Runs in a
+    worker process when called through run_days, so everything in the result is picklable.
+    """
+    catalog = Catalog([data_dir])
+
+    # the DataFrame is only needed to write the activities log
+    market_data, log_path = None, None
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, f"trade_history_{strategy_name(strategy)}_day_{day}.log")
+        market_data = catalog.load_frame(round_number, day, "prices")
+
+    # vectorized marks come from the dataset cache instead of being recomputed by every run
+    fair_marks = {product: catalog.load_marks(round_number, day, mark) if isinstance(mark, VectorizedMark) else mark
+                  for product, mark in fair_calculations.items()}
+
+    trader = load_trader_class(strategy)()
+    backtester = Backtester(trader, listings, position_limit, fair_marks, market_data, None, log_path,
+                            prices=catalog.load_prices(round_number, day), trades=catalog.load_trades(round_number, day),
+                            log_indent=log_indent, trader_data_mode=trader_data_mode, profile=profile,
+                            observations=catalog.load_observations(round_number, day)
+                            if catalog.has(round_number, day, "observations") else None)
+    with silenced(quiet):
+        analytics = backtester.run()
+
+    return {
+        "day": day,
+        "strategy": strategy,
+        "pnl": {product: float(value) for product, value in backtester.pnl.items()},
+        "pnl_history": backtester.pnl_history.tolist(),
+        "analytics": analytics,
+        "log_path": log_path,
+        "max_trader_data_bytes": max(backtester.trader_data_stats["bytes"], default=None),
+        "profile": backtester.profiler.report() if profile else None,
+    }
+
+
+def summarise(results: List[Dict[str, Any]]) -> pd.DataFrame:
+    """One row per (strategy, day) with the final PnL of each product, the total, and its drawdown and Sharpe."""
+    rows = []
+    for result in results:
+        row = {"strategy": result["strategy"], "day": result["day"]}
+        row.update(result["pnl"])
+        row["total"] = sum(result["pnl"].values())
+        row["max_drawdown"] = result["analytics"].loc["TOTAL", "max_drawdown"]
+        row["sharpe"] = result["analytics"].loc["TOTAL", "sharpe"]
+        rows.append(row)
+    summary = pd.DataFrame(rows)
+    if summary.empty:
+        return summary
+    return summary.sort_values(by=["strategy", "day"]).reset_index(drop=True)
+
+
+def run_days(days: List[int], strategies: List[str], max_workers: int = None,
+             **kwargs) -> Tuple[List[Dict[str, Any]], pd.DataFrame]:
+    """
+    Run every (day, strategy) pair in its own process. The jobs share nothing, so a full set of days
+    takes about as long as the slowest single day given enough cores.
+
+    Extra keyword arguments are passed on to run_day.
+    """
+    jobs = [(day, strategy) for strategy in strategies for day in days]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_day, day, strategy, **kwargs) for day, strategy in jobs]
+        results = [future.result() for future in futures]
+    return results, summarise(results)
+
+
+def run_continuous(days: List[int], strategy: str, round_number: int = 2, data_dir: str = ".",
+                   log_dir: str = "clean_data_logs", quiet: bool = False, carry_over: bool = True,
+                   **kwargs) -> pd.DataFrame:
+    """
+    Backtest one strategy over all days as a single run (see multiday.MultiDayBacktester) and return
+    its summary. Extra keyword arguments go to every day's Backtester.
+    """
+    log_path = None
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, f"trade_history_{strategy_name(strategy)}_days_"
+                                         f"{'_'.join(str(day) for day in days)}.log")
+    backtester = MultiDayBacktester(load_trader_class(strategy)(), listings, position_limit, fair_calculations,
+                                    round_number, days, data_dir, log_path, carry_over=carry_over, **kwargs)
+    with silenced(quiet):
+        return backtester.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest strategies over several days in parallel.")
+    parser.add_argument("--days", type=int, nargs="+", default=[-1, 0, 1])
+    parser.add_argument("--strategy", dest="strategies", nargs="+", default=["Round2:Trader"],
+                        help="module or .py path, optionally with :ClassName")
+    parser.add_argument("--round", dest="round_number", type=int, default=2)
+    parser.add_argument("--data-dir", default=".", help="directory or zip searched for the round's files")
+    parser.add_argument("--log-dir", default="clean_data_logs")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true", help="discard what traders print")
+    parser.add_argument("--compact-logs", action="store_true", help="write log files without JSON indentation")
+    parser.add_argument("--trader-data", dest="trader_data_mode", default="serialize",
+                        choices=["serialize", "passthrough", "fidelity"],
+                        help="how traderData is carried between ticks, see Backtester")
+    parser.add_argument("--profile", action="store_true", help="time every phase of every tick and print a report")
+    parser.add_argument("--continuous", action="store_true",
+                        help="run each strategy over all days as one run, timestamps offset by day * 1e6")
+    parser.add_argument("--reset-daily", action="store_true",
+                        help="with --continuous, reset positions, cash and traderData at every day boundary")
+    args = parser.parse_args(argv)
+
+    if args.continuous:
+        summaries = {}
+        for strategy in args.strategies:
+            summaries[strategy] = run_continuous(args.days, strategy, round_number=args.round_number,
+                                                 data_dir=args.data_dir, log_dir=args.log_dir, quiet=args.quiet,
+                                                 carry_over=not args.reset_daily,
+                                                 log_indent=None if args.compact_logs else 2,
+                                                 trader_data_mode=args.trader_data_mode)
+            print(strategy)
+            print(summaries[strategy].to_string())
+            print()
+        return summaries
+
+    results, summary = run_days(args.days, args.strategies, max_workers=args.workers,
+                                round_number=args.round_number, data_dir=args.data_dir,
+                                log_dir=args.log_dir, quiet=args.quiet,
+                                log_indent=None if args.compact_logs else 2,
+                                trader_data_mode=args.trader_data_mode, profile=args.profile)
+    for result in results:
+        if result["profile"] is not None:
+            print(f"{result['strategy']} day {result['day']}")
+            print(result["profile"])
+            print()
+    print(summary.to_string(index=False))
+    print()
+    print(summary.groupby("strategy")["total"].sum().to_string())
+    return results, summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Throughput benchmark of the backtester on the bundled data and strategies.
+
+Each case (a strategy on one round and day) runs in its own Python process, so its peak memory is
+measured on its own. A case first loads the compiled data (timed separately, and served from the
+dataset cache after the first run), times repeat full runs of Backtester.run, then does one more
+run with profiling on for the per-phase breakdown. The no-op trader shows what the engine itself
+costs per tick.
+
+Example:
+
+    python benchmark.py --output benchmark_baseline.json
+    # ... change the backtester ...
+    python benchmark.py --compare benchmark_baseline.json --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import backtester_run
+from backtester import Backtester
+from datasets import Catalog
+
+DATA_ROOTS = ("data/round-1-island-data-bottle", "round-2-island-data-bottle.zip")
+
+CASES = {
+    "noop-round-1": {"strategy": "benchmark:NoopTrader", "round": 1, "day": 0},
+    "example-program-round-1": {"strategy": "example-program.py:Trader", "round": 1, "day": 0},
+    "noop-round-2": {"strategy": "benchmark:NoopTrader", "round": 2, "day": 0},
+    "round2-round-2": {"strategy": "Round2:Trader", "round": 2, "day": 0, "trader_data_mode": "passthrough"},
+}
+
+# fail a comparison when ticks per second drop by more than this fraction
+REGRESSION_THRESHOLD = 0.10
+
+
+class NoopTrader:
+    """Sends no orders, so a run measures only the engine."""
+
+    def run(self, state):
+        return {}, 0, ""
+
+
+def _peak_memory_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def run_case(case: Dict[str, Any], repeat: int = 1, phases: bool = True) -> Dict[str, Any]:
+    """Benchmark one case in this process."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    catalog = Catalog([os.path.join(root, data_root) for data_root in DATA_ROOTS])
+    trader_class = backtester_run.load_trader_class(case["strategy"])
+
+    start = time.perf_counter()
+    prices = catalog.load_prices(case["round"], case["day"])
+    trades = catalog.load_trades(case["round"], case["day"])
+    load_seconds = time.perf_counter() - start
+
+    def backtest(profile):
+        return Backtester(trader_class(), backtester_run.listings, backtester_run.position_limit,
+                          backtester_run.fair_calculations, None, None, prices=prices, trades=trades,
+                          trader_data_mode=case.get("trader_data_mode", "serialize"), profile=profile)
+
+    run_seconds = []
+    with backtester_run.silenced():
+        for _ in range(repeat):
+            backtester = backtest(False)
+            start = time.perf_counter()
+            backtester.run()
+            run_seconds.append(time.perf_counter() - start)
+        if phases:
+            profiled = backtest(True)
+            profiled.run()
+
+    best = min(run_seconds)
+    result = {
+        "ticks": len(prices),
+        "load_seconds": load_seconds,
+        "run_seconds": run_seconds,
+        "ticks_per_second": len(prices) / best,
+        "peak_memory_mb": _peak_memory_mb(),
+        "pnl": float(sum(backtester.pnl.values())),
+    }
+    if phases:
+        result["phase_ms_per_tick"] = profiled.profiler.percentiles()["mean"].to_dict()
+    return result
+
+
+def run_case_in_subprocess(name: str, repeat: int = 1, phases: bool = True) -> Dict[str, Any]:
+    root = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.abspath(__file__), "--child", name, "--repeat", str(repeat)]
+    if not phases:
+        command.append("--no-phases")
+    output = subprocess.run(command, cwd=root, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run_suite(names: List[str] = None, repeat: int = 1, phases: bool = True) -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cases": {name: run_case_in_subprocess(name, repeat, phases) for name in names or CASES},
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Cases whose throughput fell more than threshold below the baseline, as messages."""
+    regressions = []
+    for name, result in results["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        before, after = baseline["cases"][name]["ticks_per_second"], result["ticks_per_second"]
+        if after < before * (1 - threshold):
+            regressions.append(f"{name}: {after:.0f} ticks/s, {1 - after / before:.1%} below the baseline "
+                               f"{before:.0f} ticks/s")
+    return regressions
+
+
+def format_results(results: Dict[str, Any], baseline: Dict[str, Any] = None) -> str:
+    lines = [f"{'case':28} {'ticks/s':>9} {'change':>8} {'run s':>7} {'load s':>7} {'peak MB':>8}  slowest phases (ms/tick)"]
+    for name, result in results["cases"].items():
+        change = ""
+        if baseline is not None and name in baseline["cases"]:
+            change = f"{result['ticks_per_second'] / baseline['cases'][name]['ticks_per_second'] - 1:+.1%}"
+        phases = sorted((item for item in result.get("phase_ms_per_tick", {}).items() if item[0] != "total"),
+                        key=lambda item: -item[1])
+        phases = ", ".join(f"{phase} {ms:.3f}" for phase, ms in phases[:3])
+        lines.append(f"{name:28} {result['ticks_per_second']:9.0f} {change:>8} {min(result['run_seconds']):7.2f} "
+                     f"{result['load_seconds']:7.2f} {result['peak_memory_mb']:8.1f}  {phases}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtester on the bundled strategies and data.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per case; the fastest counts")
+    parser.add_argument("--no-phases", dest="phases", action="store_false", help="skip the profiled run")
+    parser.add_argument("--output", help="write the results to this JSON file, e.g. as a new baseline")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="fraction of baseline throughput that may be lost before the comparison fails")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case(CASES[args.child], args.repeat, args.phases)))
+        return 0
+
+    results = run_suite(args.cases, args.repeat, args.phases)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print(format_results(results, baseline))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
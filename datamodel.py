@@ -5,6 +5,9 @@ https://imc-prosperity.notion.site/Writing-an-Algorithm-in-Python-19ee8453a09381
 """
 
 import json
+from bisect import bisect_left, insort
+from collections.abc import ItemsView, KeysView, ValuesView
+from itertools import repeat
 from typing import Dict, List
 from json import JSONEncoder
 import jsonpickle
@@ -20,6 +23,8 @@ ObservationValue = int
 
 class Listing:
 
+    __slots__ = ("symbol", "product", "denomination")
+
     def __init__(self, symbol: Symbol, product: Product, denomination: Product):
         self.symbol = symbol
         self.product = product
@@ -28,6 +33,8 @@ class Listing:
                  
 class ConversionObservation:
 
+    __slots__ = ("bidPrice", "askPrice", "transportFees", "exportTariff", "importTariff", "sugarPrice", "sunlightIndex")
+
     def __init__(self, bidPrice: float, askPrice: float, transportFees: float, exportTariff: float, importTariff: float, sugarPrice: float, sunlightIndex: float):
         self.bidPrice = bidPrice
         self.askPrice = askPrice
@@ -40,6 +47,8 @@ class ConversionObservation:
 
 class Observation:
 
+    __slots__ = ("plainValueObservations", "conversionObservations")
+
     def __init__(self, plainValueObservations: Dict[Product, ObservationValue], conversionObservations: Dict[Product, ConversionObservation]) -> None:
         self.plainValueObservations = plainValueObservations
         self.conversionObservations = conversionObservations
@@ -50,6 +59,8 @@ class Observation:
 
 class Order:
 
+    __slots__ = ("symbol", "price", "quantity")
+
     def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
         self.symbol = symbol
         self.price = price
@@ -62,15 +73,152 @@ class Order:
         return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
     
 
+# The collections.abc views iterate through a Python generator; these hand out C iterators, since
+# traders and the matching loop walk the book every tick.
+class _PriceKeys(KeysView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self._mapping)
+
+
+class _PriceValues(ValuesView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return map(dict.__getitem__, repeat(self._mapping), self._mapping)
+
+
+class _PriceItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        prices = list(self._mapping)
+        return zip(prices, map(dict.__getitem__, repeat(self._mapping), prices))
+
+
+class PriceLevels(dict):
+    """
+    One side of an OrderDepth: a price -> volume dict whose prices are also kept sorted.
+
+    It is a real dict, so traders written against the exchange's plain dicts keep working and it
+    serialises the same way. Iteration (keys/values/items) goes best price first: highest first for
+    bids (descending=True), lowest first for asks. best() is O(1).
+    """
+
+    __slots__ = ("_prices", "descending")
+
+    def __init__(self, levels=None, descending: bool = False):
+        super().__init__()
+        self._prices = []  # ascending
+        self.descending = descending
+        if levels:
+            self.update(levels)
+
+    def __reduce__(self):
+        return self.__class__, (dict(self.items()), self.descending)
+
+    def __setitem__(self, price, volume):
+        if price not in self:
+            insort(self._prices, price)
+        super().__setitem__(price, volume)
+
+    def __delitem__(self, price):
+        super().__delitem__(price)
+        del self._prices[bisect_left(self._prices, price)]
+
+    def __iter__(self):
+        return reversed(self._prices) if self.descending else iter(self._prices)
+
+    def __reversed__(self):
+        return iter(self._prices) if self.descending else reversed(self._prices)
+
+    # views in price order; like a dict's views they follow later changes to the levels
+    def keys(self):
+        return _PriceKeys(self)
+
+    def values(self):
+        return _PriceValues(self)
+
+    def items(self):
+        return _PriceItems(self)
+
+    def best(self):
+        """Best price on this side, or None if it is empty."""
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.descending else self._prices[0]
+
+    def pop(self, price, *default):
+        if price in self:
+            volume = self[price]
+            del self[price]
+            return volume
+        if default:
+            return default[0]
+        raise KeyError(price)
+
+    def popitem(self):
+        if not self._prices:
+            raise KeyError("popitem(): price levels are empty")
+        price = self.best()
+        return price, self.pop(price)
+
+    def setdefault(self, price, volume=None):
+        if price not in self:
+            self[price] = volume
+        return self[price]
+
+    def update(self, *args, **kwargs):
+        # bulk insert, then one sort: cheaper than insort per level when building a book
+        super().update(*args, **kwargs)
+        self._prices = sorted(dict.keys(self))
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        levels = self.copy()
+        levels.update(other)
+        return levels
+
+    @classmethod
+    def fromkeys(cls, prices, volume=None):
+        return cls(dict.fromkeys(prices, volume))
+
+    def clear(self):
+        super().clear()
+        self._prices.clear()
+
+    def copy(self):
+        levels = self.__class__(descending=self.descending)
+        dict.update(levels, dict.items(self))
+        levels._prices = self._prices.copy()
+        return levels
+
+
 class OrderDepth:
 
+    __slots__ = ("buy_orders", "sell_orders")
+
     def __init__(self):
-        self.buy_orders: Dict[int, int] = {}
-        self.sell_orders: Dict[int, int] = {}
+        self.buy_orders: Dict[int, int] = PriceLevels(descending=True)
+        self.sell_orders: Dict[int, int] = PriceLevels()
+
+    def best_bid(self):
+        return self.buy_orders.best()
+
+    def best_ask(self):
+        return self.sell_orders.best()
 
 
 class Trade:
 
+    __slots__ = ("symbol", "price", "quantity", "buyer", "seller", "timestamp")
+
     def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId=None, seller: UserId=None, timestamp: int=0) -> None:
         self.symbol = symbol
         self.price: int = price
@@ -88,6 +236,8 @@ class Trade:
 
 class TradingState(object):
 
+    __slots__ = ("traderData", "timestamp", "listings", "order_depths", "own_trades", "market_trades", "position", "observations")
+
     def __init__(self,
                  traderData: str,
                  timestamp: Time,
@@ -107,13 +257,26 @@ class TradingState(object):
         self.observations = observations
         
     def toJSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True)
+        return json.dumps(self, default=_fields, sort_keys=True)
 
     
+def _fields(o):
+    # the classes above use __slots__ instead of an instance __dict__; a subclass may add its own
+    # slots (or none, as tickstream.ReadOnlyOrderDepth) or a __dict__, so collect them all
+    fields = {}
+    for cls in reversed(type(o).__mro__):
+        slots = cls.__dict__.get("__slots__", ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ("__dict__", "__weakref__") and hasattr(o, name):
+                fields[name] = getattr(o, name)
+    fields.update(getattr(o, "__dict__", {}))
+    return fields
+
+
 class ProsperityEncoder(JSONEncoder):
 
         def default(self, o):
-            return o.__dict__
+            return _fields(o)
 
 
 class LoadTradingState():
@@ -141,8 +304,22 @@ class LoadTradingState():
 
             trader.run(state)
 
+    To build states for many timestamps, use states.StateLoader, which indexes the day once.
     """
 
+    @staticmethod
+    def _order_depth(row) -> OrderDepth:
+        # levels missing from the row (NaN in the CSV) are left out of the book
+        order_depth = OrderDepth()
+        for level in range(1, 4):
+            bid_price, bid_volume = row[f"bid_price_{level}"], row[f"bid_volume_{level}"]
+            if not (pd.isna(bid_price) or pd.isna(bid_volume)):
+                order_depth.buy_orders[int(bid_price)] = int(bid_volume)
+            ask_price, ask_volume = row[f"ask_price_{level}"], row[f"ask_volume_{level}"]
+            if not (pd.isna(ask_price) or pd.isna(ask_volume)):
+                order_depth.sell_orders[int(ask_price)] = -int(ask_volume)
+        return order_depth
+
     def load_single_product(self, df: pd.DataFrame, row_id: int):
 
         # Select the row of the dataframe, and create a TradingState object from the row.
@@ -169,14 +346,7 @@ class LoadTradingState():
         self.symbol = row["product"]
         self.denomination = row["product"]
         self.listing = Listing(self.symbol, self.product, self.denomination)
-        self.order_depth = OrderDepth()
-        self.order_depth.buy_orders[self.bid_price_1] = self.bid_volume_1
-
-        self.order_depth.buy_orders[self.bid_price_2] = self.bid_volume_2
-        self.order_depth.buy_orders[self.bid_price_3] = self.bid_volume_3
-        self.order_depth.sell_orders[self.ask_price_1] = self.ask_volume_1
-        self.order_depth.sell_orders[self.ask_price_2] = self.ask_volume_2
-        self.order_depth.sell_orders[self.ask_price_3] = self.ask_volume_3
+        self.order_depth = self._order_depth(row)
         self.position = {self.product: 0}
         self.own_trades = {self.product: []}
         self.market_trades = {self.product: []}
@@ -219,13 +389,7 @@ class LoadTradingState():
         for index, row in df.iterrows():
             product = row["product"]
             listing = Listing(row["product"], row["product"], row["product"])
-            order_depth = OrderDepth()
-            order_depth.buy_orders[row["bid_price_1"]] = row["bid_volume_1"]
-            order_depth.buy_orders[row["bid_price_2"]] = row["bid_volume_2"]
-            order_depth.buy_orders[row["bid_price_3"]] = row["bid_volume_3"]
-            order_depth.sell_orders[row["ask_price_1"]] = -row["ask_volume_1"]
-            order_depth.sell_orders[row["ask_price_2"]] = -row["ask_volume_2"]
-            order_depth.sell_orders[row["ask_price_3"]] = -row["ask_volume_3"]
+            order_depth = self._order_depth(row)
 
             self.listings[product] = listing
             self.order_depths[product] = order_depth
@@ -0,0 +1,330 @@
+"""
+Cached loading of the prices/trades CSVs, from plain files or straight out of the zipped data bottles.
+
+The first load of a CSV parses it and stores the result as one .npy file per column (or per compiled
+array) under CACHE_DIR. Later loads memory-map those files instead of parsing the CSV again. A cache
+entry is keyed on the source file's size and mtime; if only the mtime changed, the content hash
+decides whether the entry is still valid. A CSV inside a zip archive is keyed on the size and CRC-32
+that the archive records for it.
+
+Processes sharing a cache (e.g. the workers of backtester_run.run_days) take a lock file per entry
+while they check, build and open it, so an entry is built once and never replaced under a reader.
+
+Example:
+
+    import marks
+    from datasets import load_frame, load_marks, load_prices, load_trades
+
+    market_data = load_frame("data/round-1-island-data-bottle/prices_round_1_day_0.csv")
+    prices = load_prices("data/round-1-island-data-bottle/prices_round_1_day_0.csv")
+    trades = load_trades("data/round-1-island-data-bottle/trades_round_1_day_0.csv")
+    microprice = load_marks("data/round-1-island-data-bottle/prices_round_1_day_0.csv", marks.MICROPRICE)
+
+    catalog = Catalog(["data", "round-2-island-data-bottle.zip"])
+    print(catalog.rounds(), catalog.days(2))
+    prices = catalog.load_prices(2, 0)
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tickstream import CompiledObservations, CompiledPrices, CompiledTrades
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CACHE_DIR = os.environ.get("PROSPERITY_CACHE_DIR", ".prosperity_cache")
+CACHE_VERSION = 1
+
+DATA_FILE = re.compile(r"(prices|trades|observations)_round_(\d+)_day_(-?\d+)\.csv$")
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_dir(name: str, kind: str) -> str:
+    source = hashlib.sha1(name.encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{os.path.basename(name)}.{source}.{kind}")
+
+
+def _read_meta(directory: str):
+    try:
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def _write_meta(directory: str, meta: Dict[str, Any]):
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", "w") as file:
+        json.dump(meta, file)
+    os.replace(path + ".tmp", path)
+
+
+@contextlib.contextmanager
+def _locked(directory: str):
+    # held from the freshness check until the arrays are open; memory maps stay valid after that,
+    # even if a later process replaces the entry
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(directory + ".lock", "a+") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            # locks the file's first byte; LK_LOCK gives up after about 10 seconds, so keep asking
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _cached(directory: str, is_fresh: Callable[[Dict[str, Any]], bool], source: Callable[[], Dict[str, Any]],
+            build: Callable[[], Tuple[Dict[str, np.ndarray], Dict[str, Any]]]
+            ) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    with _locked(directory):
+        return _load_entry(directory, is_fresh, source, build)
+
+
+def _load_entry(directory, is_fresh, source, build):
+    meta = _read_meta(directory)
+    if meta is None or not is_fresh(meta):
+        identity = source()
+        arrays, extra = build()
+        staging = tempfile.mkdtemp(dir=CACHE_DIR)
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+        meta = {
+            "version": CACHE_VERSION,
+            "source": identity,
+            "arrays": {name: len(array) for name, array in arrays.items()},
+            "extra": extra,
+        }
+        _write_meta(staging, meta)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+
+    arrays = {}
+    for name, length in meta["arrays"].items():
+        # an empty array has nothing to map
+        arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if length else None)
+    return arrays, meta["extra"]
+
+
+def cached_arrays(path: str, kind: str, build: Callable[[Any], Tuple[Dict[str, np.ndarray], Dict[str, Any]]],
+                  member: str = None) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Arrays and JSON-able metadata built from a CSV, served from the cache when it is fresh.
+
+    The CSV is the file at path, or the archive member member of the zip file at path. build gets a
+    path or open binary file to read the CSV from, and is only called on a cache miss. Cached arrays
+    are read-only memory maps.
+    """
+    if member is not None:
+        return _cached_member(path, member, kind, build)
+
+    directory = _cache_dir(os.path.abspath(path), kind)
+
+    def is_fresh(meta):
+        stat = os.stat(path)
+        source = meta["source"]
+        if source["size"] != stat.st_size:
+            return False
+        if source["mtime_ns"] != stat.st_mtime_ns:
+            if source["sha1"] != _file_hash(path):
+                return False
+            # touched but unchanged: remember the new mtime so the hash isn't needed next time
+            source["mtime_ns"] = stat.st_mtime_ns
+            _write_meta(directory, meta)
+        return True
+
+    def source():
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": _file_hash(path)}
+
+    return _cached(directory, is_fresh, source, lambda: build(path))
+
+
+def _cached_member(path: str, member: str, kind: str, build):
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(member)
+        identity = {"size": info.file_size, "crc32": info.CRC}
+
+        def read():
+            # decompressed as it is parsed, never extracted to disk
+            with archive.open(member) as file:
+                return build(file)
+
+        return _cached(_cache_dir(f"{os.path.abspath(path)}!{member}", kind),
+                       lambda meta: meta["source"] == identity, lambda: identity, read)
+
+
+def _frame_arrays(path):
+    df = pd.read_csv(path, sep=";", header=0)
+    arrays, categories = {}, {}
+    for column in df.columns:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            arrays[column] = df[column].to_numpy()
+        else:
+            codes, uniques = pd.factorize(df[column])
+            arrays[column] = codes.astype(np.int32)
+            categories[column] = [str(value) for value in uniques]
+    return arrays, {"columns": list(df.columns), "categories": categories,
+                    "dtypes": {column: str(df[column].dtype) for column in categories}}
+
+
+def _compiled_arrays(compiled_class):
+    def build(path):
+        compiled = compiled_class.from_csv(path)
+        return ({field: getattr(compiled, field) for field in compiled.ARRAY_FIELDS},
+                {field: getattr(compiled, field) for field in compiled.LIST_FIELDS})
+    return build
+
+
+def load_frame(path: str, member: str = None) -> pd.DataFrame:
+    """The CSV at path (or member of the zip at path) as pd.read_csv(path, sep=";") would return it."""
+    arrays, extra = cached_arrays(path, "frame", _frame_arrays, member)
+    data = {}
+    for column in extra["columns"]:
+        if column in extra["categories"]:
+            values = pd.Categorical.from_codes(arrays[column], extra["categories"][column])
+            data[column] = pd.Series(values).astype(extra["dtypes"][column])
+        else:
+            data[column] = np.array(arrays[column])
+    return pd.DataFrame(data)
+
+
+def load_prices(path: str, member: str = None) -> CompiledPrices:
+    arrays, lists = cached_arrays(path, "prices", _compiled_arrays(CompiledPrices), member)
+    return CompiledPrices(**arrays, **lists)
+
+
+def load_trades(path: str, member: str = None) -> CompiledTrades:
+    arrays, lists = cached_arrays(path, "trades", _compiled_arrays(CompiledTrades), member)
+    return CompiledTrades(**arrays, **lists)
+
+
+def load_observations(path: str, member: str = None) -> CompiledObservations:
+    arrays, lists = cached_arrays(path, "observations", _compiled_arrays(CompiledObservations), member)
+    return CompiledObservations(**arrays, **lists)
+
+
+def load_marks(path: str, mark, member: str = None) -> np.ndarray:
+    """
+    A marks.VectorizedMark computed on the prices CSV at path (or member of the zip at path), one
+    value per compiled row, cached under the mark's key.
+    """
+    def build(source):
+        return {"values": mark(load_prices(path, member))}, {}
+
+    arrays, _ = cached_arrays(path, f"marks.{mark.key}", build, member)
+    return arrays["values"]
+
+
+def _is_resource_fork(name: str) -> bool:
+    # macOS metadata that ships inside the data bottle zips
+    return "__MACOSX" in name.split("/") or os.path.basename(name).startswith("._")
+
+
+class Catalog:
+    """
+    The rounds and days available under a set of directories and zip archives.
+
+    Directories are searched recursively (hidden directories and the cache are skipped) and zip
+    archives found in them are read too. If the same file exists both extracted and in an archive,
+    the extracted copy is used.
+    """
+
+    def __init__(self, roots: List[str] = (".",)):
+        # (round, day, "prices" | "trades" | "observations") -> (path, archive member or None)
+        self.files: Dict[Tuple[int, int, str], Tuple[str, str]] = {}
+        for root in roots:
+            if zipfile.is_zipfile(root):
+                self._add_archive(root)
+            elif os.path.isfile(root):
+                self._add(root, None, os.path.basename(root))
+            else:
+                for directory, subdirectories, names in os.walk(root):
+                    subdirectories[:] = sorted(name for name in subdirectories
+                                               if not name.startswith(".") and name != "__MACOSX")
+                    for name in sorted(names):
+                        path = os.path.join(directory, name)
+                        if name.endswith(".zip") and zipfile.is_zipfile(path):
+                            self._add_archive(path)
+                        elif not _is_resource_fork(name):
+                            self._add(path, None, name)
+
+    def _add_archive(self, path: str):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if not _is_resource_fork(member):
+                    self._add(path, member, os.path.basename(member))
+
+    def _add(self, path: str, member: str, name: str):
+        match = DATA_FILE.match(name)
+        if match is None:
+            return
+        key = (int(match.group(2)), int(match.group(3)), match.group(1))
+        if key in self.files and (member is not None or self.files[key][1] is None):
+            return
+        self.files[key] = (path, member)
+
+    def rounds(self) -> List[int]:
+        return sorted({round_number for round_number, _, _ in self.files})
+
+    def days(self, round_number: int) -> List[int]:
+        return sorted({day for r, day, _ in self.files if r == round_number})
+
+    def location(self, round_number: int, day: int, kind: str) -> Tuple[str, str]:
+        try:
+            return self.files[(round_number, day, kind)]
+        except KeyError:
+            raise FileNotFoundError(f"no {kind} file for round {round_number} day {day}") from None
+
+    def load_frame(self, round_number: int, day: int, kind: str) -> pd.DataFrame:
+        return load_frame(*self.location(round_number, day, kind))
+
+    def load_prices(self, round_number: int, day: int) -> CompiledPrices:
+        return load_prices(*self.location(round_number, day, "prices"))
+
+    def load_trades(self, round_number: int, day: int) -> CompiledTrades:
+        return load_trades(*self.location(round_number, day, "trades"))
+
+    def load_observations(self, round_number: int, day: int) -> CompiledObservations:
+        return load_observations(*self.location(round_number, day, "observations"))
+
+    def has(self, round_number: int, day: int, kind: str) -> bool:
+        return (round_number, day, kind) in self.files
+
+    def load_marks(self, round_number: int, day: int, mark) -> np.ndarray:
+        path, member = self.location(round_number, day, "prices")
+        return load_marks(path, mark, member)
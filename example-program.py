@@ -1,10 +1,85 @@
 from typing import Dict, List
 from datamodel import OrderDepth, TradingState, Order
-import jsonpickle
+import json
+import math
 import numpy as np
 
+
+class RollingWindow:
+    """
+    Mean of the last `window` values for the SQUID_INK signal: the part of rolling.RollingWindow this
+    trader uses, copied since a submission is a single file (tests/test_rolling.py keeps them in step).
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = []
+        self.head = 0  # index of the oldest value once the buffer is full
+        self.total = 0.0
+        self.m2 = 0.0
+
+    @property
+    def full(self):
+        return len(self.values) == self.window
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else 0.0
+
+    def push(self, value):
+        values = self.values
+        if len(values) < self.window:
+            old_mean = self.mean
+            values.append(value)
+            self.total += value
+            self.m2 += (value - old_mean) * (value - self.mean)
+            return
+        oldest = values[self.head]
+        values[self.head] = value
+        self.head += 1
+        if self.head == self.window:
+            # exact recompute once per pass, so rounding errors cannot build up
+            self.head = 0
+            self.total = math.fsum(values)
+            mean = self.mean
+            self.m2 = math.fsum((v - mean) ** 2 for v in values)
+            return
+        old_mean = self.mean
+        self.total += value - oldest
+        self.m2 += (value - oldest) * (value - self.mean + oldest - old_mean)
+
+    def __getstate__(self):
+        return [self.window, self.head, self.total, self.m2, self.values]
+
+    @classmethod
+    def restore(cls, state):
+        window = cls.__new__(cls)
+        window.window, window.head, window.total, window.m2, window.values = state
+        return window
+
+
+def load_windows(traderData):
+    """traderData as written by dump_windows, back as {key: RollingWindow}."""
+    return {key: RollingWindow.restore(state) for key, state in json.loads(traderData).items()} if traderData else {}
+
+
+def dump_windows(windows):
+    """Plain JSON of each window's state; nothing the exchange would need this file's classes to decode."""
+    return json.dumps({key: window.__getstate__() for key, window in windows.items()}, separators=(",", ":"))
+
+
 class Trader:
 
+    # set by the backtester: return the state object as traderData instead of encoding it
+    passthrough = False
+
+    def decode_trader_data(self, traderData: str) -> dict:
+        """The state written by encode_trader_data (the backtester times both in fidelity mode)."""
+        return load_windows(traderData)
+
+    def encode_trader_data(self, data: dict) -> str:
+        return dump_windows(data)
+
     def run(self, state: TradingState) -> Dict[str, List[Order]]:
         """
         Only method required. It takes all buy and sell orders for all symbols as an input,
@@ -14,7 +89,10 @@ class Trader:
         result = {}
 
         # load previous data
-        data = jsonpickle.decode(state.traderData) if state.traderData else {}
+        if not isinstance(state.traderData, str):
+            data = state.traderData  # handed back as is by the backtester in passthrough mode
+        else:
+            data = self.decode_trader_data(state.traderData)
 
         # Iterate over all the keys (the available products) contained in the order dephts
         for product in state.order_depths.keys():
@@ -40,10 +118,10 @@ class Trader:
             print(f"mid_price: {mid_price}, position: {position}, best_bid: {best_bid}, best_ask: {best_ask}\n")
 
             if product == "SQUID_INK":
-                history = data.get("SQUID_INK", [])
-                if len(history) > 10:
-                    roll_mean = np.mean(history)
-                    history.pop(0)
+                # mean of the previous 11 mids
+                history = data.setdefault("SQUID_INK", RollingWindow(11))
+                if history.full:
+                    roll_mean = history.mean
 
                     # compare rolling mean with mid price and skew??
                     # skew depends on the position
@@ -63,8 +141,7 @@ class Trader:
                         print(f"SELL {ask_vol}x {ask_price}\n")
                     result[product] = orders
                 
-                history.append(mid_price)
-                data["SQUID_INK"] = history
+                history.push(mid_price)
 
 
             elif product == "RAINFOREST_RESIN":
@@ -92,10 +169,10 @@ class Trader:
                 result[product] = orders
 
   
-        traderData = jsonpickle.encode(data)
+        traderData = data if self.passthrough else self.encode_trader_data(data)
         # String value holding Trader state data required. It will be delivered as TradingState.traderData on next execution.
         
-        conversions = 1 
+        conversions = 0
 
                 # Return the dict of orders
                 # These possibly contain buy or sell orders
@@ -0,0 +1,181 @@
+"""
+Per-tick PnL ledger of a backtest and the analytics computed from it after the run.
+
+The ledger holds one preallocated (ticks, products) array each for cash, position, mark price,
+PnL, traded volume and traded notional. The backtester fills in one cell per product per tick;
+equity curve, drawdown, Sharpe ratio, turnover and per-product attribution are computed from the
+whole arrays at once at the end.
+
+Example:
+
+    backtester.run()
+    print(backtester.ledger.summary())
+    backtester.ledger.frame().plot(x="timestamp", y="equity")
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+TOTAL = "TOTAL"
+
+
+class PnLLedger:
+    """
+    Cash, position, mark and PnL of each product at each tick.
+
+    Products missing from a tick's prices keep NaN there; analytics carry their last value forward.
+    """
+
+    def __init__(self, timestamps: np.ndarray, products: List[str]):
+        self.timestamps = np.asarray(timestamps)
+        self.products = list(products)
+        self.product_index = {product: i for i, product in enumerate(self.products)}
+        shape = (len(self.timestamps), len(self.products))
+        self.cash = np.full(shape, np.nan)
+        self.position = np.full(shape, np.nan)
+        self.mark = np.full(shape, np.nan)
+        self.pnl = np.full(shape, np.nan)
+        self.volume = np.zeros(shape)
+        self.notional = np.zeros(shape)
+
+    def record(self, tick: int, product: str, cash: float, position: int, mark: float):
+        column = self.product_index[product]
+        self.cash[tick, column] = cash
+        self.position[tick, column] = position
+        self.mark[tick, column] = mark
+        self.pnl[tick, column] = cash + mark * position
+
+    def record_fills(self, tick: int, product: str, trades):
+        column = self.product_index[product]
+        for trade in trades:
+            self.volume[tick, column] += abs(trade.quantity)
+            self.notional[tick, column] += abs(trade.price * trade.quantity)
+
+    def _filled(self, values: np.ndarray) -> np.ndarray:
+        # last recorded value carried forward, 0 before a product's first tick
+        return pd.DataFrame(values).ffill().fillna(0).to_numpy()
+
+    def product_pnl(self) -> pd.DataFrame:
+        """PnL of every product at every tick, indexed by timestamp."""
+        return pd.DataFrame(self._filled(self.pnl), index=pd.Index(self.timestamps, name="timestamp"),
+                            columns=self.products)
+
+    def equity(self) -> np.ndarray:
+        """Total PnL over all products at each tick."""
+        return self._filled(self.pnl).sum(axis=1)
+
+    def drawdown(self) -> np.ndarray:
+        """Distance of the equity curve below its running maximum (zero or negative)."""
+        equity = self.equity()
+        return equity - np.maximum.accumulate(equity) if len(equity) else equity
+
+    def frame(self) -> pd.DataFrame:
+        """One row per tick: timestamp, equity, drawdown and each product's PnL and position."""
+        pnl = self._filled(self.pnl)
+        position = self._filled(self.position)
+        equity = pnl.sum(axis=1)
+        data = {"timestamp": self.timestamps, "equity": equity, "drawdown": self.drawdown()}
+        for column, product in enumerate(self.products):
+            data[f"{product}_pnl"] = pnl[:, column]
+            data[f"{product}_position"] = position[:, column]
+        return pd.DataFrame(data)
+
+    def summary(self, periods: int = None) -> pd.DataFrame:
+        """
+        Final PnL, share of the total, max drawdown, Sharpe ratio, traded volume and turnover of each
+        product and of the whole book (the TOTAL row).
+
+        The Sharpe ratio is the mean over the standard deviation of the per-tick PnL changes, scaled by
+        sqrt(periods); periods defaults to the number of ticks, i.e. the ratio over one run.
+        """
+        pnl = np.column_stack([self._filled(self.pnl), self.equity()])
+        if len(pnl) == 0:
+            pnl = np.zeros((1, len(self.products) + 1))
+        volume = np.column_stack([self.volume, self.volume.sum(axis=1)])
+        notional = np.column_stack([self.notional, self.notional.sum(axis=1)])
+        periods = len(self.timestamps) if periods is None else periods
+
+        drawdown = (pnl - np.maximum.accumulate(pnl, axis=0)).min(axis=0)
+        changes = np.diff(pnl, axis=0, prepend=0.0)
+        return _summary_frame(self.products, pnl[-1], drawdown, changes.mean(axis=0), changes.std(axis=0),
+                              periods, volume.sum(axis=0), notional.sum(axis=0))
+
+
+class RunningSummary:
+    """
+    PnLLedger.summary of a run recorded as a sequence of ledgers, such as one per chunk of a
+    streaming backtest. Each ledger is folded into running totals when added, so none of them has
+    to be kept; products are matched by name, and a product missing from a ledger keeps its last PnL.
+    """
+
+    def __init__(self, products: List[str]):
+        self.products = list(products)
+        self.product_index = {product: i for i, product in enumerate(self.products)}
+        width = len(self.products) + 1
+        self.ticks = 0
+        self.last = np.zeros(width)
+        self.peak = np.full(width, -np.inf)
+        self.max_drawdown = np.zeros(width)
+        self.change_sum = np.zeros(width)
+        self.change_squares = np.zeros(width)
+        self.volume = np.zeros(width)
+        self.notional = np.zeros(width)
+
+    def add(self, ledger: PnLLedger, restart: bool = False):
+        """
+        Fold in the ticks of ledger. With restart, its PnL started again from zero (positions and cash
+        were reset before it) and is counted on top of the PnL so far.
+        """
+        if len(ledger.timestamps) == 0:
+            return
+        columns = [self.product_index[product] for product in ledger.products]
+        pnl = np.full((len(ledger.timestamps), len(self.products)), np.nan)
+        pnl[:, columns] = ledger.pnl
+        # carried forward from the previous ledger's last tick, or from zero on a restart
+        start = np.zeros(len(self.products)) if restart else self.last[:-1]
+        pnl = pd.DataFrame(np.vstack([start, pnl])).ffill().to_numpy()[1:]
+        if restart:
+            pnl = pnl + self.last[:-1]
+        pnl = np.column_stack([pnl, pnl.sum(axis=1)])
+
+        peak = np.maximum(np.maximum.accumulate(pnl, axis=0), self.peak)
+        self.max_drawdown = np.minimum(self.max_drawdown, (pnl - peak).min(axis=0))
+        self.peak = peak[-1]
+        changes = np.diff(pnl, axis=0, prepend=self.last[None, :])
+        self.change_sum += changes.sum(axis=0)
+        self.change_squares += (changes ** 2).sum(axis=0)
+        self.volume[columns] += ledger.volume.sum(axis=0)
+        self.volume[-1] += ledger.volume.sum()
+        self.notional[columns] += ledger.notional.sum(axis=0)
+        self.notional[-1] += ledger.notional.sum()
+        self.last = pnl[-1]
+        self.ticks += len(pnl)
+
+    def summary(self, periods: int = None) -> pd.DataFrame:
+        """The same table as PnLLedger.summary, over every tick added so far."""
+        ticks = max(self.ticks, 1)
+        mean = self.change_sum / ticks
+        std = np.sqrt(np.maximum(self.change_squares / ticks - mean ** 2, 0))
+        periods = self.ticks if periods is None else periods
+        return _summary_frame(self.products, self.last, self.max_drawdown, mean, std, periods,
+                              self.volume, self.notional)
+
+
+def _summary_frame(products: List[str], final: np.ndarray, drawdown: np.ndarray, mean: np.ndarray,
+                   std: np.ndarray, periods: int, volume: np.ndarray, notional: np.ndarray) -> pd.DataFrame:
+    # every argument has one value per product and a last one for the TOTAL row
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods), np.nan)
+        share = final / final[-1] if final[-1] != 0 else np.full(len(final), np.nan)
+
+    return pd.DataFrame({
+        "pnl": final,
+        "share": share,
+        "max_drawdown": drawdown,
+        "sharpe": sharpe,
+        "volume": volume,
+        "turnover": notional,
+    }, index=pd.Index(products + [TOTAL], name="product"))
+
@@ -0,0 +1,333 @@
+"""
+Prosperity submission logs, in the layout the Prosperity visualizer reads:
+
+    Sandbox logs:
+    {sandbox log entry as JSON}
+    ...
+
+
+
+    Activities log:
+    day;timestamp;product;...;profit_and_loss
+    ...
+
+
+
+    Trade History:
+    [trade dicts as a JSON array]
+"""
+
+import codecs
+import io
+import json
+import mmap
+import shutil
+import tempfile
+from array import array
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+ACTIVITIES_CHUNK_ROWS = 10000
+READ_CHUNK_BYTES = 1 << 20
+
+SECTION_HEADERS = (b"Sandbox logs:", b"Activities log:", b"Trade History:")
+
+
+class TradeLog:
+    """
+    Append-only, columnar record of trades for the Trade History section.
+
+    Trades are stored as typed arrays (names interned as ids) rather than one dict per trade;
+    iterating the log yields the dicts the visualizer expects, built only at export time. Prices
+    and quantities are kept as doubles with a flag remembering whether each was an int, so the
+    exported JSON is the same as for the original values.
+    """
+
+    CURRENCY = "SEASHELLS"
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.symbol_ids = array("i")
+        self.buyer_ids = array("i")
+        self.seller_ids = array("i")
+        self.prices = array("d")
+        self.quantities = array("d")
+        self.int_flags = array("B")  # bit 0: price was an int, bit 1: quantity was an int
+        self.names = []
+        self._name_ids = {}
+
+    def _name_id(self, name: str) -> int:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def append(self, trade):
+        self.timestamps.append(trade.timestamp)
+        self.symbol_ids.append(self._name_id(trade.symbol))
+        self.buyer_ids.append(self._name_id(trade.buyer))
+        self.seller_ids.append(self._name_id(trade.seller))
+        self.prices.append(trade.price)
+        self.quantities.append(trade.quantity)
+        self.int_flags.append(isinstance(trade.price, int) | isinstance(trade.quantity, int) << 1)
+
+    def extend(self, trades):
+        for trade in trades:
+            self.append(trade)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        names = self.names
+        for timestamp, symbol_id, buyer_id, seller_id, price, quantity, flags in zip(
+                self.timestamps, self.symbol_ids, self.buyer_ids, self.seller_ids,
+                self.prices, self.quantities, self.int_flags):
+            yield {
+                "timestamp": timestamp,
+                "buyer": names[buyer_id],
+                "seller": names[seller_id],
+                "symbol": names[symbol_id],
+                "currency": self.CURRENCY,
+                "price": int(price) if flags & 1 else price,
+                "quantity": int(quantity) if flags & 2 else quantity,
+            }
+
+    def to_frame(self) -> pd.DataFrame:
+        names = np.array(self.names, dtype=object)
+        return pd.DataFrame({
+            "timestamp": np.frombuffer(self.timestamps, dtype=np.int64),
+            "buyer": names[np.frombuffer(self.buyer_ids, dtype=np.int32)],
+            "seller": names[np.frombuffer(self.seller_ids, dtype=np.int32)],
+            "symbol": names[np.frombuffer(self.symbol_ids, dtype=np.int32)],
+            "currency": self.CURRENCY,
+            "price": np.frombuffer(self.prices, dtype=np.float64),
+            "quantity": np.frombuffer(self.quantities, dtype=np.float64),
+        })
+
+
+class LogWriter:
+    """
+    Writes a log file section by section without building the whole text in memory.
+
+    Sections must be written in order: sandbox logs, activities, trade history. indent=None writes
+    compact JSON (one sandbox entry per line), which makes the files smaller and faster to write.
+
+    Example:
+
+        with LogWriter("day_0.log") as writer:
+            writer.write_sandbox_logs(backtester.sandbox_logs)
+            writer.write_activities(market_data)
+            writer.write_trades(backtester.trades)
+    """
+
+    def __init__(self, filename: str, indent: int = 2):
+        self.file = open(filename, "w")
+        self.indent = indent
+        self._separators = None if indent is not None else (",", ":")
+        self.file.write("Sandbox logs:\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def write_sandbox_log(self, entry: Dict[str, Any]):
+        self.file.write(json.dumps(entry, indent=self.indent, separators=self._separators))
+        self.file.write("\n")
+
+    def write_sandbox_logs(self, entries: Iterable[Dict[str, Any]]):
+        for entry in entries:
+            self.write_sandbox_log(entry)
+
+    def write_activities(self, market_data: pd.DataFrame, chunk_rows: int = ACTIVITIES_CHUNK_ROWS):
+        self.file.write("\n\n\n\nActivities log:\n")
+        for start in range(0, max(len(market_data), 1), chunk_rows):
+            market_data.iloc[start:start + chunk_rows].to_csv(self.file, index=False, sep=";", header=start == 0,
+                                                              lineterminator="\n")
+
+    def write_trades(self, trades: Iterable[Dict[str, Any]]):
+        """Write the trade history section as a JSON array, one trade at a time."""
+        self.file.write("\n\n\n\nTrade History:\n")
+        empty = True
+        for trade in trades:
+            self._write_trade(self.file, trade, empty)
+            empty = False
+        self._end_trades(self.file, empty)
+
+    def _write_trade(self, file, trade: Dict[str, Any], first: bool):
+        if self.indent is None:
+            file.write("[" if first else ",")
+            file.write(json.dumps(trade, separators=self._separators))
+        else:
+            pad = " " * self.indent
+            file.write("[\n" if first else ",\n")
+            file.write(pad + json.dumps(trade, indent=self.indent).replace("\n", "\n" + pad))
+
+    def _end_trades(self, file, empty: bool):
+        if empty:
+            file.write("[]")
+        else:
+            file.write("]" if self.indent is None else "\n]")
+
+
+class SpillingLogWriter(LogWriter):
+    """
+    A LogWriter whose sections can be written a piece at a time and in any order, e.g. once per
+    chunk of a streaming backtest.
+
+    Sandbox log entries go straight into the file; activities and trades are spilled to temporary
+    files and copied in behind them on close, so nothing accumulates in memory.
+    """
+
+    def __init__(self, filename: str, indent: int = 2):
+        super().__init__(filename, indent)
+        self._activities = tempfile.TemporaryFile("w+")
+        self._trades = tempfile.TemporaryFile("w+")
+        self._activities_header = True
+        self._no_trades = True
+
+    def write_activities(self, market_data: pd.DataFrame, chunk_rows: int = ACTIVITIES_CHUNK_ROWS):
+        for start in range(0, len(market_data), chunk_rows):
+            market_data.iloc[start:start + chunk_rows].to_csv(self._activities, index=False, sep=";",
+                                                              header=self._activities_header, lineterminator="\n")
+            self._activities_header = False
+
+    def write_trades(self, trades: Iterable[Dict[str, Any]]):
+        for trade in trades:
+            self._write_trade(self._trades, trade, self._no_trades)
+            self._no_trades = False
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write("\n\n\n\nActivities log:\n")
+        self._activities.seek(0)
+        shutil.copyfileobj(self._activities, self.file)
+        self.file.write("\n\n\n\nTrade History:\n")
+        self._trades.seek(0)
+        shutil.copyfileobj(self._trades, self.file)
+        self._end_trades(self.file, self._no_trades)
+        self._activities.close()
+        self._trades.close()
+        super().close()
+
+
+class _MappedSection(io.RawIOBase):
+    """File-like, read-only window onto part of a memory-mapped file."""
+
+    def __init__(self, mapped: mmap.mmap, start: int, end: int):
+        super().__init__()
+        self.mapped = mapped
+        self.position = start
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.end - self.position)
+        buffer[:size] = self.mapped[self.position:self.position + size]
+        self.position += size
+        return size
+
+
+def _section_bounds(mapped: mmap.mmap) -> Dict[bytes, Tuple[int, int]]:
+    """(start, end) byte offsets of each section's body, found without copying the file."""
+    starts, offset = [], 0
+    for header in SECTION_HEADERS:
+        offset = mapped.find(header, offset)
+        if offset == -1:
+            raise ValueError(f"log file has no {header.decode()} section")
+        starts.append((offset, offset + len(header)))
+    ends = [offset for offset, _ in starts[1:]] + [len(mapped)]
+    return {header: (body, end) for header, (_, body), end in zip(SECTION_HEADERS, starts, ends)}
+
+
+def _iter_json_objects(mapped: mmap.mmap, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    """
+    Decode the JSON objects between start and end one at a time, reading the mapping in chunks.
+
+    Anything between objects (whitespace, and the brackets and commas of an enclosing array) is
+    skipped, so this reads both the sandbox log entries and the trade history array.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    text, offset, position = "", 0, start
+    while True:
+        begin = text.find("{", offset)
+        if begin != -1:
+            try:
+                obj, offset = decoder.raw_decode(text, begin)
+                yield obj
+                continue
+            except json.JSONDecodeError:
+                if position >= end:
+                    raise
+        if position >= end:
+            return
+        # need more data: keep the unfinished object (if any) and read the next chunk
+        text = (text[begin:] if begin != -1 else "") + text_decoder.decode(
+            mapped[position:min(position + READ_CHUNK_BYTES, end)], final=position + READ_CHUNK_BYTES >= end)
+        offset, position = 0, min(position + READ_CHUNK_BYTES, end)
+
+
+def _records_to_frame(records: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    columns = {}
+    count = 0
+    for record in records:
+        for key, value in record.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * count
+            column.append(value)
+        count += 1
+        for column in columns.values():
+            if len(column) < count:
+                column.append(None)
+    return pd.DataFrame(columns)
+
+
+def _read_section(filename: str, header: bytes, read):
+    with open(filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start, end = _section_bounds(mapped)[header]
+        return read(mapped, start, end)
+
+
+def read_activities(filename: str) -> pd.DataFrame:
+    """The activities log (prices, one row per timestamp and product) of a log file."""
+    return _read_section(filename, b"Activities log:", lambda mapped, start, end: pd.read_csv(
+        io.BufferedReader(_MappedSection(mapped, start, end), READ_CHUNK_BYTES), sep=";", header=0))
+
+
+def read_trade_history(filename: str) -> pd.DataFrame:
+    """The trade history of a log file, one row per trade."""
+    return _read_section(filename, b"Trade History:", lambda mapped, start, end: _records_to_frame(
+        _iter_json_objects(mapped, start, end)))
+
+
+def read_sandbox_logs(filename: str) -> pd.DataFrame:
+    return _read_section(filename, b"Sandbox logs:", lambda mapped, start, end: _records_to_frame(
+        _iter_json_objects(mapped, start, end)))
+
+
+def read_log(filename: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Market data and trade history of a submission or backtest log, in the shape Backtester takes.
+
+    The file is memory-mapped and each section is parsed straight from the mapping in chunks, so the
+    log is never held in memory as one string.
+    """
+    with open(filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        bounds = _section_bounds(mapped)
+        market_data = pd.read_csv(io.BufferedReader(_MappedSection(mapped, *bounds[b"Activities log:"]),
+                                                    READ_CHUNK_BYTES), sep=";", header=0)
+        trade_history = _records_to_frame(_iter_json_objects(mapped, *bounds[b"Trade History:"]))
+    return market_data, trade_history
@@ -0,0 +1,152 @@
+"""
+Fair values for marking positions, computed for a whole day at once.
+
+Backtester's fair_marks maps a product to how its position is valued. Besides a function called
+with the product's OrderDepth every tick, a value can be
+
+    a VectorizedMark: a function of the CompiledPrices returning one value per compiled row,
+        such as MID, MICROPRICE, BOOK_VWAP or synthetic(...) below,
+    an array with one value per compiled row (e.g. from datasets.load_marks), or
+    a pd.Series of values indexed by timestamp.
+
+These are all turned into a (ticks, products) grid before the run, which the backtester reads by
+index. A VectorizedMark is computed once per CompiledPrices object; datasets.load_marks and
+Catalog.load_marks also cache it on disk next to the compiled data. The cache is keyed on the
+mark's key, so change the key when a mark's definition changes.
+
+Example:
+
+    fair_marks = {
+        "SQUID_INK": MICROPRICE,
+        "PICNIC_BASKET1": synthetic({"DJEMBES": 1, "JAMS": 3, "CROISSANTS": 6}),
+    }
+"""
+
+import weakref
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tickstream import CompiledPrices
+
+
+class VectorizedMark:
+    """A fair value function over all rows of a CompiledPrices; key names it in caches."""
+
+    def __init__(self, key: str, function: Callable[[CompiledPrices], np.ndarray]):
+        self.key = key
+        self.function = function
+
+    def __call__(self, prices: CompiledPrices) -> np.ndarray:
+        return np.asarray(self.function(prices), dtype=np.float64)
+
+    def __repr__(self):
+        return f"VectorizedMark({self.key!r})"
+
+
+def _best(prices: CompiledPrices) -> Tuple[np.ndarray, np.ndarray]:
+    # best bid and ask over the valid levels of each row, NaN for an empty side
+    best_bid = np.where(prices.bid_valid, prices.bid_prices, -np.inf).max(axis=1)
+    best_ask = np.where(prices.ask_valid, prices.ask_prices, np.inf).min(axis=1)
+    return (np.where(prices.bid_valid.any(axis=1), best_bid, np.nan),
+            np.where(prices.ask_valid.any(axis=1), best_ask, np.nan))
+
+
+def _mid(prices: CompiledPrices) -> np.ndarray:
+    best_bid, best_ask = _best(prices)
+    return (best_ask + best_bid) / 2
+
+
+def _microprice(prices: CompiledPrices) -> np.ndarray:
+    # top of book prices weighted by the volume on the opposite side
+    best_bid, best_ask = _best(prices)
+    bid_volume = np.where(prices.bid_valid[:, 0], prices.bid_volumes[:, 0], 0)
+    ask_volume = np.where(prices.ask_valid[:, 0], prices.ask_volumes[:, 0], 0)
+    total = bid_volume + ask_volume
+    with np.errstate(divide="ignore", invalid="ignore"):
+        micro = (best_bid * ask_volume + best_ask * bid_volume) / total
+    return np.where(total > 0, micro, (best_ask + best_bid) / 2)
+
+
+def _book_vwap(prices: CompiledPrices) -> np.ndarray:
+    # volume-weighted price of every visible level on both sides
+    bid_volume = np.where(prices.bid_valid, prices.bid_volumes, 0)
+    ask_volume = np.where(prices.ask_valid, prices.ask_volumes, 0)
+    notional = (bid_volume * prices.bid_prices).sum(axis=1) + (ask_volume * prices.ask_prices).sum(axis=1)
+    volume = bid_volume.sum(axis=1) + ask_volume.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(volume > 0, notional / volume, np.nan)
+
+
+MID = VectorizedMark("mid", _mid)
+MICROPRICE = VectorizedMark("microprice", _microprice)
+BOOK_VWAP = VectorizedMark("book_vwap", _book_vwap)
+
+
+def _row_ticks(prices: CompiledPrices) -> np.ndarray:
+    return np.repeat(np.arange(len(prices)), np.diff(prices.tick_starts))
+
+
+def rows_to_grid(prices: CompiledPrices, values: np.ndarray) -> np.ndarray:
+    """Per-row values as a (ticks, products) grid; NaN where a product has no row at a tick."""
+    grid = np.full((len(prices), len(prices.products)), np.nan)
+    grid[_row_ticks(prices), prices.product_ids] = values
+    return grid
+
+
+class _Synthetic:
+    # a class rather than a closure so that the mark can be pickled into worker processes
+    def __init__(self, components: Dict[str, float], base: VectorizedMark):
+        self.components = components
+        self.base = base
+
+    def __call__(self, prices: CompiledPrices) -> np.ndarray:
+        grid = rows_to_grid(prices, cached_mark(prices, self.base))
+        total = np.zeros(len(prices))
+        for product, weight in self.components.items():
+            total = total + weight * grid[:, prices.products.index(product)]
+        return total[_row_ticks(prices)]
+
+
+def synthetic(components: Dict[str, float], base: VectorizedMark = MID) -> VectorizedMark:
+    """Value of a basket as the weighted sum of its components' base marks at the same tick."""
+    key = "synthetic-" + "-".join(f"{weight:g}{product}" for product, weight in components.items())
+    return VectorizedMark(f"{key}-{base.key}", _Synthetic(components, base))
+
+
+# CompiledPrices -> {mark key: values per row}, dropped with the prices
+_computed = weakref.WeakKeyDictionary()
+
+
+def cached_mark(prices: CompiledPrices, mark: VectorizedMark) -> np.ndarray:
+    """mark(prices), computed once per CompiledPrices object."""
+    values = _computed.setdefault(prices, {})
+    if mark.key not in values:
+        values[mark.key] = mark(prices)
+    return values[mark.key]
+
+
+def mark_grid(prices: CompiledPrices, fair_marks: Dict[str, object]) -> Tuple[np.ndarray, Dict[str, Callable]]:
+    """
+    The (ticks, products) grid of marks for everything in fair_marks that can be computed up front,
+    with the mid price for products not in it, and the per-tick OrderDepth functions left over.
+    """
+    grid = rows_to_grid(prices, cached_mark(prices, MID))
+    per_tick = {}
+    for product, mark in fair_marks.items():
+        if product not in prices.products:
+            continue
+        column = prices.products.index(product)
+        if isinstance(mark, VectorizedMark):
+            grid[:, column] = rows_to_grid(prices, cached_mark(prices, mark))[:, column]
+        elif isinstance(mark, pd.Series):
+            grid[:, column] = mark.reindex(prices.tick_timestamps).to_numpy(dtype=np.float64)
+        elif isinstance(mark, np.ndarray):
+            if len(mark) != len(prices.timestamps):
+                raise ValueError(f"fair mark array for {product} has {len(mark)} values, "
+                                 f"expected one per prices row ({len(prices.timestamps)})")
+            grid[:, column] = rows_to_grid(prices, mark)[:, column]
+        else:
+            per_tick[product] = mark
+    return grid, per_tick
@@ -0,0 +1,111 @@
+"""
+One continuous backtest over a sequence of days.
+
+Days run one after the other through the same trader object. With carry_over (the default) the
+positions, cash, traderData and previous-tick trades at the end of a day are where the next day
+starts; without it they are reset at every day boundary, as in separate runs, and the day PnLs add
+up. Timestamps are offset to day * 1e6 + timestamp, the alltime axis of round2plots.py, so they keep
+increasing across the run (in the TradingState, the sandbox logs, activities and trades alike).
+
+While a day is being simulated, a background thread loads and compiles the next one (prices, trades,
+observations, vectorized marks and, for the log, the prices DataFrame), so there is no wait for I/O
+between days. Everything is read through datasets.Catalog and its cache.
+
+Example:
+
+    backtester = MultiDayBacktester(Trader(), listings, position_limit, fair_calculations,
+                                    round_number=2, days=[-1, 0, 1], file_name="round2_all_days.log")
+    print(backtester.run())
+    print(backtester.day_summaries[0])
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from backtester import Backtester
+from datamodel import Listing
+from datasets import Catalog
+from ledger import RunningSummary
+from marks import VectorizedMark
+from streaming import run_chained
+from tickstream import shift_timestamps
+
+DAY_LENGTH = 1_000_000
+
+
+class MultiDayBacktester:
+    """
+    Backtester over days of one round. Other keyword arguments (log_indent, trader_data_mode,
+    trader_budget_ms) go to every day's Backtester.
+    """
+
+    def __init__(self, trader, listings: Dict[str, Listing], position_limit: Dict[str, int], fair_marks,
+                 round_number: int, days: List[int], data_dir: str = ".", file_name: str = None,
+                 carry_over: bool = True, offset_timestamps: bool = True, prefetch: bool = True,
+                 log_indent: int = 2, **backtester_options):
+        self.trader = trader
+        self.listings = listings
+        self.position_limit = position_limit
+        self.fair_marks = fair_marks
+        self.catalog = Catalog([data_dir])
+        self.round_number = round_number
+        self.days = list(days)
+        self.file_name = file_name
+        self.carry_over = carry_over
+        self.offset_timestamps = offset_timestamps
+        self.prefetch = prefetch
+        self.log_indent = log_indent
+        self.backtester_options = backtester_options
+        self.summary = RunningSummary(list(listings))
+        # day -> PnLLedger.summary of that day's ticks (PnL counted from the run's start with carry_over)
+        self.day_summaries = {}
+
+    def load_day(self, day: int) -> Dict[str, Any]:
+        """Everything a day's Backtester is built from, with its timestamps offset."""
+        catalog, round_number = self.catalog, self.round_number
+        offset = day * DAY_LENGTH if self.offset_timestamps else 0
+        observations = None
+        if catalog.has(round_number, day, "observations"):
+            observations = shift_timestamps(catalog.load_observations(round_number, day), offset)
+        market_data = None
+        if self.file_name is not None:
+            market_data = catalog.load_frame(round_number, day, "prices")
+            market_data["timestamp"] += offset
+        return {
+            "prices": shift_timestamps(catalog.load_prices(round_number, day), offset),
+            "trades": shift_timestamps(catalog.load_trades(round_number, day), offset),
+            "observations": observations,
+            "market_data": market_data,
+            # vectorized marks come from the dataset cache, as in backtester_run
+            "fair_marks": {product: catalog.load_marks(round_number, day, mark)
+                           if isinstance(mark, VectorizedMark) else mark
+                           for product, mark in self.fair_marks.items()},
+        }
+
+    def loaded_days(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(day, load_day(day)) for every day, the next day loading while the caller runs the current one."""
+        if not self.prefetch:
+            for day in self.days:
+                yield day, self.load_day(day)
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            upcoming = executor.submit(self.load_day, self.days[0]) if self.days else None
+            for i, day in enumerate(self.days):
+                data = upcoming.result()
+                if i + 1 < len(self.days):
+                    upcoming = executor.submit(self.load_day, self.days[i + 1])
+                yield day, data
+
+    def run(self) -> pd.DataFrame:
+        """Run every day, write the log file if file_name is set and return the summary of the whole run."""
+        backtesters = (Backtester(self.trader, self.listings, self.position_limit, data["fair_marks"],
+                                  data["market_data"], None, prices=data["prices"], trades=data["trades"],
+                                  observations=data["observations"], **self.backtester_options)
+                       for day, data in self.loaded_days())
+        # loaded_days yields the days in order, so the n-th backtester run is for self.days[n]
+        for day, backtester in zip(self.days, run_chained(backtesters, self.summary, self.file_name,
+                                                          self.log_indent, self.carry_over)):
+            self.day_summaries[day] = backtester.ledger.summary()
+        return self.summary.summary()
@@ -0,0 +1,88 @@
+"""
+Per-tick timing of the phases of a backtest.
+
+With profiling on, Backtester reads time.perf_counter_ns between the phases of every tick and
+stores the durations here; with it off the clock is never read. Ticks where Trader.run takes
+longer than the budget (the exchange enforces a time limit per call) are flagged in the sandbox
+log and listed by over_budget().
+
+Example:
+
+    backtester = Backtester(..., profile=True, trader_budget_ms=900)
+    backtester.run()
+    print(backtester.profiler.report())
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# in the order they run within a tick
+PHASES = ("book", "trader", "matching", "trader_data", "market_trades", "mark", "log")
+
+PERCENTILES = (50, 90, 99, 99.9, 100)
+
+
+class TickProfiler:
+    """Nanosecond durations of every phase of every tick, reported in milliseconds."""
+
+    def __init__(self, timestamps: np.ndarray, trader_budget_ms: float = 900.0):
+        self.timestamps = np.asarray(timestamps)
+        self.trader_budget_ms = trader_budget_ms
+        self.durations = np.zeros((len(self.timestamps), len(PHASES)), dtype=np.int64)
+        self.recorded = np.zeros(len(self.timestamps), dtype=bool)
+
+    def record(self, tick: int, clock: Sequence[int]):
+        """Store the durations between consecutive clock readings, one more reading than PHASES."""
+        self.durations[tick] = [end - start for start, end in zip(clock, clock[1:])]
+        self.recorded[tick] = True
+
+    def frame(self) -> pd.DataFrame:
+        """One row per profiled tick: timestamp, milliseconds spent in each phase, and total."""
+        milliseconds = self.durations[self.recorded] / 1e6
+        frame = pd.DataFrame(milliseconds, columns=list(PHASES))
+        frame.insert(0, "timestamp", self.timestamps[self.recorded])
+        frame["total"] = milliseconds.sum(axis=1)
+        return frame
+
+    def percentiles(self, percentiles: Sequence[float] = PERCENTILES) -> pd.DataFrame:
+        """Milliseconds per tick at each percentile, one row per phase (and total), plus mean and sum."""
+        frame = self.frame().drop(columns="timestamp")
+        if frame.empty:
+            return pd.DataFrame(index=frame.columns)
+        table = pd.DataFrame(np.percentile(frame.to_numpy(), percentiles, axis=0).T, index=frame.columns,
+                             columns=[f"p{p:g}" for p in percentiles])
+        table["mean"] = frame.mean().to_numpy()
+        table["sum"] = frame.sum().to_numpy()
+        return table
+
+    def histogram(self, phase: str = "trader", bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Counts and bin edges (in milliseconds) of the per-tick durations of a phase or "total"."""
+        return np.histogram(self.frame()[phase].to_numpy(), bins=bins)
+
+    def slowest(self, n: int = 10, phase: str = "total") -> pd.DataFrame:
+        """The n ticks that spent longest in phase, with their full breakdown."""
+        return self.frame().nlargest(n, phase)
+
+    def over_budget(self) -> pd.DataFrame:
+        """Ticks where Trader.run took longer than trader_budget_ms."""
+        frame = self.frame()
+        return frame[frame["trader"] > self.trader_budget_ms]
+
+    def report(self, n: int = 10, bins: int = 10) -> str:
+        lines: List[str] = ["Milliseconds per tick:", self.percentiles().to_string(float_format="%.4f"), ""]
+
+        counts, edges = self.histogram("trader", bins)
+        lines.append("Trader.run histogram (ms):")
+        width = max(counts.max(initial=0), 1)
+        for count, low, high in zip(counts, edges, edges[1:]):
+            lines.append(f"  {low:9.4f} - {high:9.4f} {count:7d} {'#' * round(40 * count / width)}")
+        lines.append("")
+
+        lines.append(f"Slowest {n} ticks:")
+        lines.append(self.slowest(n).to_string(index=False, float_format="%.4f"))
+        over = self.over_budget()
+        lines.append("")
+        lines.append(f"{len(over)} ticks over the Trader.run budget of {self.trader_budget_ms:g} ms")
+        return "\n".join(lines)
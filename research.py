@@ -0,0 +1,210 @@
+"""
+Research mode: strategies written against whole-day arrays instead of one TradingState per tick.
+
+A research strategy is a function that gets a MarketArrays (every book level, mid price and the
+trade tape of a day, aligned on a (ticks, products) grid) and returns, per product, either
+
+    an array of target positions, one per tick, or
+    a (limit_prices, quantities) pair of arrays: one limit order per tick, quantity > 0 buys,
+    < 0 sells, 0 sends nothing.
+
+A NaN target or quantity, as pandas rolling() signals give during their warm-up, holds the position.
+
+backtest_arrays fills them with an approximation of Backtester's matching rules and returns a
+PnLLedger, so the same analytics as for a full backtest apply. This is meant for screening many
+signal variants quickly; port the ones worth keeping to a Trader and confirm them with Backtester.
+
+Where the approximation differs from Backtester:
+    - a fill that would break the position limit is cut down to the limit, not rejected per level
+      (and tape fills respect the limit too, which Backtester does not check for them)
+    - a target only trades against the visible book; it is never filled from the trade tape
+    - an order's tape fills see every print at that tick, not what earlier orders left of them
+    - marks are always the mid price (fair_marks are not used)
+
+Example:
+
+    def basket_spread(market, window=3000, threshold=1.2):
+        mid = pd.DataFrame(market.mid, columns=market.products)
+        spread = mid["PICNIC_BASKET1"] - (mid["DJEMBES"] + 3 * mid["JAMS"] + 6 * mid["CROISSANTS"])
+        z = ((spread - spread.rolling(window).mean()) / spread.rolling(window).std()).to_numpy()
+        return {"PICNIC_BASKET1": np.where(z > threshold, -60, np.where(z < -threshold, 60, 0))}
+
+    market = load_market(2, 0)
+    print(backtest_arrays(basket_spread, market).summary())
+    print(screen(basket_spread, {"window": [1000, 3000], "threshold": [1.0, 1.5, 2.0]}, market))
+"""
+
+import itertools
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import backtester_run
+from datasets import Catalog
+from ledger import PnLLedger, TOTAL
+from tickstream import CompiledPrices, CompiledTrades, LEVELS
+
+Targets = np.ndarray
+OrderArrays = Tuple[np.ndarray, np.ndarray]
+Strategy = Callable[..., Dict[str, Union[Targets, OrderArrays]]]
+
+
+class MarketArrays:
+    """
+    One day of compiled prices and trades on a (ticks, products) grid.
+
+    Book arrays are (ticks, products, LEVELS), best level first. Levels that are empty, and products
+    without a row at a tick, have a NaN price and zero volume; mid is NaN there too. Volumes are
+    positive on both sides. trades is the compiled trade tape and trade_ticks the tick of each of its
+    rows (-1 for prints at a timestamp without prices).
+    """
+
+    def __init__(self, prices: CompiledPrices, trades: CompiledTrades):
+        self.timestamps = prices.tick_timestamps
+        self.products = list(prices.products)
+        self.index = {product: i for i, product in enumerate(self.products)}
+
+        ticks = np.repeat(np.arange(len(prices)), np.diff(prices.tick_starts))
+        columns = prices.product_ids
+        shape = (len(prices), len(self.products), LEVELS)
+
+        def grid(values, valid, empty):
+            out = np.full(shape, empty, dtype=np.float64)
+            out[ticks, columns] = np.where(valid, values, empty)
+            return out
+
+        self.bid_prices = grid(prices.bid_prices, prices.bid_valid, np.nan)
+        self.bid_volumes = grid(prices.bid_volumes, prices.bid_valid, 0.0)
+        self.ask_prices = grid(prices.ask_prices, prices.ask_valid, np.nan)
+        self.ask_volumes = grid(prices.ask_volumes, prices.ask_valid, 0.0)
+        self.mid = (self.bid_prices[:, :, 0] + self.ask_prices[:, :, 0]) / 2
+
+        self.trades = trades
+        trade_ticks = np.searchsorted(self.timestamps, trades.timestamps)
+        in_range = trade_ticks < len(self.timestamps)
+        matched = np.zeros(len(trade_ticks), dtype=bool)
+        matched[in_range] = self.timestamps[trade_ticks[in_range]] == trades.timestamps[in_range]
+        self.trade_ticks = np.where(matched, trade_ticks, -1)
+        # tape symbols as columns of the grid (-1 for symbols without prices)
+        symbol_columns = np.array([self.index.get(symbol, -1) for symbol in trades.symbols], dtype=np.int64)
+        self.trade_columns = symbol_columns[trades.symbol_ids]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def column(self, product: str) -> int:
+        return self.index[product]
+
+
+def load_market(round_number: int, day: int, data_dir: str = ".") -> MarketArrays:
+    catalog = Catalog([data_dir])
+    return MarketArrays(catalog.load_prices(round_number, day), catalog.load_trades(round_number, day))
+
+
+def _fill_path(desired: List[float], buy_capacity: List[float], sell_capacity: List[float], limit: int,
+               targets: bool) -> List[float]:
+    # The only sequential part: how much can be traded depends on the position reached so far.
+    position = 0
+    fills = [0] * len(desired)
+    for tick, (want, can_buy, can_sell) in enumerate(zip(desired, buy_capacity, sell_capacity)):
+        if want != want:
+            continue  # NaN: no signal yet, hold
+        if targets:
+            want = max(-limit, min(limit, want)) - position
+        if want > 0:
+            fill = min(want, can_buy, limit - position)
+        elif want < 0:
+            fill = -min(-want, can_sell, limit + position)
+        else:
+            continue
+        fills[tick] = fill
+        position += fill
+    return fills
+
+
+def _eligible(volumes: np.ndarray, prices: np.ndarray, limit: np.ndarray, buy: bool) -> np.ndarray:
+    # book volume an order at limit can take, per level
+    with np.errstate(invalid="ignore"):
+        ok = prices <= limit[:, None] if buy else prices >= limit[:, None]
+    return np.where(ok, volumes, 0.0)
+
+
+def backtest_arrays(strategy: Strategy, market: MarketArrays, position_limit: Dict[str, int] = None,
+                    **params) -> PnLLedger:
+    """
+    Run strategy(market, **params) and fill its targets or orders; returns the filled PnLLedger.
+
+    Position limits default to the ones in backtester_run.
+    """
+    position_limit = backtester_run.position_limit if position_limit is None else position_limit
+    ledger = PnLLedger(market.timestamps, market.products)
+    ledger.position[:] = 0
+    ledger.cash[:] = 0
+    ledger.mark[:] = pd.DataFrame(market.mid).ffill().to_numpy()
+
+    for product, decision in strategy(market, **params).items():
+        column = market.column(product)
+        limit = int(position_limit[product])
+        asks, bids = market.ask_volumes[:, column], market.bid_volumes[:, column]
+        ask_prices, bid_prices = market.ask_prices[:, column], market.bid_prices[:, column]
+
+        if isinstance(decision, tuple):
+            order_prices, quantities = (np.asarray(values, dtype=np.float64) for values in decision)
+            asks = _eligible(asks, ask_prices, order_prices, buy=True)
+            bids = _eligible(bids, bid_prices, order_prices, buy=False)
+            # prints the order could also trade with, as in Backtester: strictly better than the limit
+            rows = (market.trade_ticks >= 0) & (market.trade_columns == column)
+            ticks, tape_prices = market.trade_ticks[rows], market.trades.prices[rows]
+            tape_buy, tape_sell = np.zeros(len(market)), np.zeros(len(market))
+            np.add.at(tape_buy, ticks, np.where(tape_prices < order_prices[ticks], market.trades.quantities[rows], 0))
+            np.add.at(tape_sell, ticks, np.where(tape_prices > order_prices[ticks], market.trades.quantities[rows], 0))
+            fills = np.array(_fill_path(quantities.tolist(), (asks.sum(axis=1) + tape_buy).tolist(),
+                                        (bids.sum(axis=1) + tape_sell).tolist(), limit, targets=False),
+                             dtype=np.float64)
+        else:
+            order_prices = None
+            fills = np.array(_fill_path(np.asarray(decision, dtype=np.float64).tolist(), asks.sum(axis=1).tolist(),
+                                        bids.sum(axis=1).tolist(), limit, targets=True), dtype=np.float64)
+
+        # price the fills by walking the book best level first, then the tape at the order's price
+        buying = fills > 0
+        remaining = np.abs(fills)
+        notional = np.zeros(len(market))
+        for level in range(LEVELS):
+            volume = np.where(buying, asks[:, level], bids[:, level])
+            price = np.where(buying, ask_prices[:, level], bid_prices[:, level])
+            take = np.minimum(remaining, volume)
+            notional += np.where(take > 0, take * price, 0.0)
+            remaining -= take
+        if order_prices is not None:
+            notional += remaining * order_prices
+
+        ledger.position[:, column] = np.cumsum(fills)
+        ledger.cash[:, column] = np.cumsum(np.where(buying, -notional, notional))
+        ledger.volume[:, column] = np.abs(fills)
+        ledger.notional[:, column] = notional
+
+    ledger.pnl[:] = ledger.cash + np.nan_to_num(ledger.mark) * ledger.position
+    return ledger
+
+
+def screen(strategy: Strategy, grid: Dict[str, List[Any]], market: MarketArrays,
+           position_limit: Dict[str, int] = None) -> pd.DataFrame:
+    """
+    backtest_arrays for every point of grid; one row per point with its parameters, the final PnL of
+    each traded product, the total and its drawdown and Sharpe, ranked by total PnL.
+    """
+    rows = []
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid.keys(), values))
+        summary = backtest_arrays(strategy, market, position_limit, **params).summary()
+        row = dict(params)
+        row.update({product: pnl for product, pnl in summary["pnl"].items() if product != TOTAL and pnl != 0})
+        row["total"] = summary.loc[TOTAL, "pnl"]
+        row["max_drawdown"] = summary.loc[TOTAL, "max_drawdown"]
+        row["sharpe"] = summary.loc[TOTAL, "sharpe"]
+        rows.append(row)
+    results = pd.DataFrame(rows).sort_values(by="total", ascending=False).reset_index(drop=True)
+    results.insert(0, "rank", np.arange(1, len(results) + 1))
+    return results
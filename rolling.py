@@ -0,0 +1,135 @@
+"""
+Rolling statistics with O(1) updates, for keeping signal state in traderData.
+
+Each accumulator keeps only what it needs (a ring buffer for windowed statistics, a single value
+for the EMA), and __getstate__ gives it as a plain list to store in traderData as JSON. A window's
+state holds every value in it, so it is as large as the window: a 3000-value window of spreads is
+roughly 20 KB of JSON, against the exchange's limit of 50,000 characters for all of traderData.
+
+Submissions are a single file and the exchange cannot import this module, so copy the classes you
+use into the trader (as Round2.py and example-program.py do) and store their __getstate__ lists,
+not the objects: jsonpickle would record a py/object reference to a class it cannot find there.
+
+Example:
+
+    windows = {key: RollingWindow.restore(state) for key, state in json.loads(state.traderData).items()}
+    spread = windows.setdefault("spread_A", RollingWindow(3000))
+    spread.push(value)
+    if spread.full:
+        z = spread.zscore(value)
+    traderData = json.dumps({key: window.__getstate__() for key, window in windows.items()})
+"""
+
+import math
+
+
+class RollingWindow:
+    """
+    Mean, variance and z-score over the last `window` values.
+
+    The running sum and sum of squared deviations are updated incrementally on every push and
+    recomputed exactly once per pass over the buffer, so rounding errors cannot build up. Prices and
+    spreads are short binary fractions, so their running sum stays exact and mean matches np.mean.
+    Variance and std are population statistics (ddof=0), like np.var / np.std.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = []
+        self.head = 0  # index of the oldest value once the buffer is full
+        self.total = 0.0
+        self.m2 = 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.values) if self.values else 0.0
+
+    def push(self, value: float):
+        values = self.values
+        if len(values) < self.window:
+            old_mean = self.mean
+            values.append(value)
+            self.total += value
+            self.m2 += (value - old_mean) * (value - self.mean)
+            return
+
+        oldest = values[self.head]
+        values[self.head] = value
+        self.head += 1
+        if self.head == self.window:
+            self.head = 0
+            self._recompute()
+            return
+        old_mean = self.mean
+        self.total += value - oldest
+        self.m2 += (value - oldest) * (value - self.mean + oldest - old_mean)
+
+    def _recompute(self):
+        self.total = math.fsum(self.values)
+        mean = self.mean
+        self.m2 = math.fsum((value - mean) ** 2 for value in self.values)
+
+    @property
+    def variance(self) -> float:
+        if not self.values:
+            return 0.0
+        return max(self.m2, 0.0) / len(self.values)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def zscore(self, value: float = None, eps: float = 1e-6) -> float:
+        """z-score of value (default: the newest value) against the window."""
+        if value is None:
+            value = self.last
+        return (value - self.mean) / (self.std + eps)
+
+    @property
+    def last(self) -> float:
+        if not self.full:
+            return self.values[-1]
+        return self.values[self.head - 1]
+
+    def __getstate__(self):
+        return [self.window, self.head, self.total, self.m2, self.values]
+
+    def __setstate__(self, state):
+        self.window, self.head, self.total, self.m2, self.values = state
+
+    @classmethod
+    def restore(cls, state) -> "RollingWindow":
+        """A window from its __getstate__ list."""
+        window = cls.__new__(cls)
+        window.__setstate__(state)
+        return window
+
+
+class EMA:
+    """Exponential moving average; give either the smoothing factor alpha or a span (alpha = 2 / (span + 1))."""
+
+    def __init__(self, alpha: float = None, span: float = None):
+        if (alpha is None) == (span is None):
+            raise ValueError("give exactly one of alpha and span")
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.value = None
+
+    def push(self, value: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def __getstate__(self):
+        return [self.alpha, self.value]
+
+    def __setstate__(self, state):
+        self.alpha, self.value = state
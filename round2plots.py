@@ -1,9 +1,11 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from datasets import Catalog
 
-# Read the data
-dfs = [pd.read_csv(f"prices_round_2_day_{i}.csv", sep=';') for i in range(-1, 2)]
+# Read the data, extracted or straight from the data bottle zip
+catalog = Catalog()
+dfs = [catalog.load_frame(2, i, "prices") for i in range(-1, 2)]
 df = pd.concat(dfs, ignore_index=True)
 df['alltime'] = df['day'] * 1e6 + df['timestamp']
 pivot = df.pivot(index='alltime', columns='product', values='mid_price').sort_index()
@@ -0,0 +1,98 @@
+"""
+TradingStates for any timestamp of a day, for calling Trader.run at chosen market moments.
+
+StateLoader builds its timestamp index once (from the compiled prices, trades and observations);
+after that a state for one timestamp costs one book per product, wherever in the day it is.
+
+Example:
+
+    loader = StateLoader.from_catalog(2, 0)
+    trader = Trader()
+    orders, conversions, traderData = trader.run(loader.state(412300, position={"JAMS": 120}))
+
+    for state in loader.batch([1000, 50000, 999900]):
+        print(state.timestamp, trader.run(state)[0])
+"""
+
+from typing import Dict, Iterable, Iterator, List
+
+import pandas as pd
+
+from datamodel import Listing, Observation, Trade, TradingState
+from datasets import Catalog
+from tickstream import CompiledObservations, CompiledPrices, CompiledTrades
+
+
+class StateLoader:
+    """
+    TradingState of a timestamp as the backtester would hand it to the trader before any trading:
+    the books of that timestamp, the market trades printed at the previous timestamp, the
+    observation in effect and, unless given, flat positions and no own trades or traderData.
+    """
+
+    def __init__(self, prices: CompiledPrices, trades: CompiledTrades = None,
+                 observations: CompiledObservations = None, listings: Dict[str, Listing] = None):
+        self.prices = prices
+        self.trades = trades
+        self.observations = observations
+        self.listings = listings if listings is not None else {
+            product: Listing(product, product, "SEASHELLS") for product in prices.products}
+
+    @classmethod
+    def from_dataframe(cls, market_data: pd.DataFrame, trade_history: pd.DataFrame = None, **kwargs) -> "StateLoader":
+        trades = CompiledTrades.from_dataframe(trade_history) if trade_history is not None else None
+        return cls(CompiledPrices.from_dataframe(market_data), trades, **kwargs)
+
+    @classmethod
+    def from_catalog(cls, round_number: int, day: int, data_dir: str = ".", **kwargs) -> "StateLoader":
+        catalog = Catalog([data_dir])
+        observations = None
+        if catalog.has(round_number, day, "observations"):
+            observations = catalog.load_observations(round_number, day)
+        trades = catalog.load_trades(round_number, day) if catalog.has(round_number, day, "trades") else None
+        return cls(catalog.load_prices(round_number, day), trades, observations, **kwargs)
+
+    @property
+    def timestamps(self) -> List[int]:
+        return self.prices.tick_timestamps.tolist()
+
+    def _tick(self, timestamp: int) -> int:
+        tick = self.prices.tick_at(timestamp)
+        if tick == len(self.prices) or self.prices.tick_timestamps[tick] != timestamp:
+            raise KeyError(f"no prices at timestamp {timestamp}")
+        return tick
+
+    def _market_trades(self, tick: int) -> Dict[str, List[Trade]]:
+        market_trades = {}
+        if self.trades is None or tick == 0:
+            return market_trades
+        for row in self.trades.rows_for(int(self.prices.tick_timestamps[tick - 1])):
+            trade = self.trades.trade(row)
+            market_trades.setdefault(trade.symbol, []).append(trade)
+        return market_trades
+
+    def _state(self, tick: int, position: Dict[str, int], traderData: str,
+               own_trades: Dict[str, List[Trade]]) -> TradingState:
+        timestamp = int(self.prices.tick_timestamps[tick])
+        observation = (self.observations.observation(timestamp) if self.observations is not None
+                       else Observation({}, {}))
+        positions = {product: 0 for product in self.listings}
+        positions.update(position or {})
+        return TradingState(traderData, timestamp, self.listings, self.prices.order_depths(tick),
+                            dict(own_trades or {}), self._market_trades(tick), positions, observation)
+
+    def state(self, timestamp: int, position: Dict[str, int] = None, traderData: str = "",
+              own_trades: Dict[str, List[Trade]] = None) -> TradingState:
+        """The state at timestamp; a KeyError if the prices have no rows at exactly that timestamp."""
+        return self._state(self._tick(timestamp), position, traderData, own_trades)
+
+    def window(self, start: int, end: int, position: Dict[str, int] = None, traderData: str = "",
+               own_trades: Dict[str, List[Trade]] = None) -> Iterator[TradingState]:
+        """States for every timestamp from start to end, both included."""
+        for tick in range(self.prices.tick_at(start), self.prices.tick_at(end + 1)):
+            yield self._state(tick, position, traderData, own_trades)
+
+    def batch(self, timestamps: Iterable[int], **kwargs) -> Iterator[TradingState]:
+        """States for each of timestamps, in the order given."""
+        for timestamp in timestamps:
+            yield self.state(timestamp, **kwargs)
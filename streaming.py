@@ -0,0 +1,193 @@
+"""
+Streaming backtests: prices and trades read from CSV in timestamp-ordered chunks, logs spilled to
+disk as they are produced, so memory stays the same however many days are chained.
+
+A pipeline of generators reads each prices file chunk_rows lines at a time, cut at timestamp
+boundaries, and pairs every chunk with the trades printed up to its last timestamp. Each chunk is
+compiled and run by a Backtester that picks up the positions, cash, traderData and previous-tick
+trades where the last one stopped. Its sandbox logs, activities (with profit_and_loss) and trades
+then go to a SpillingLogWriter and its ledger is folded into a RunningSummary, after which the
+chunk is dropped.
+
+Days are run one after the other with the trader's state carried over; their timestamps are left
+as they are in the files. Prices and trades files must be sorted by timestamp, as the exchange's
+are. fair_marks work as for Backtester, except that arrays of one value per prices row (such as
+datasets.load_marks) cannot be used, since a chunk only covers part of a day.
+
+Example:
+
+    backtester = StreamingBacktester.from_catalog(Trader(), listings, position_limit, fair_calculations,
+                                                  round_number=2, days=[-1, 0, 1], data_dir=".",
+                                                  file_name="round2.log")
+    print(backtester.run())
+"""
+
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+import pandas as pd
+
+from backtester import Backtester
+from datamodel import Listing
+from datasets import Catalog
+from ledger import RunningSummary
+from logs import SpillingLogWriter
+from tickstream import CompiledObservations, CompiledPrices, CompiledTrades
+
+CHUNK_ROWS = 20000
+
+TRADE_COLUMNS = ("timestamp", "buyer", "seller", "symbol", "currency", "price", "quantity")
+
+# Backtester attributes that carry from one chunk to the next
+CARRIED_FIELDS = ("trader_data", "own_trades", "market_trades", "current_position", "pnl", "cash")
+
+# a file path, or (path, member) as Catalog.location returns it, member naming a file in a zip
+Source = Union[str, Tuple[str, str]]
+
+
+def read_chunks(source: Source, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    The CSV at source, chunk_rows lines at a time, with every timestamp's rows in a single chunk.
+
+    The rows of the last timestamp in a chunk are held back and start the next one, since that
+    timestamp may continue in the lines not read yet.
+    """
+    path, member = source if isinstance(source, tuple) else (source, None)
+    if member is None:
+        yield from _timestamp_chunks(pd.read_csv(path, sep=";", chunksize=chunk_rows))
+    else:
+        with zipfile.ZipFile(path) as archive, archive.open(member) as file:
+            yield from _timestamp_chunks(pd.read_csv(file, sep=";", chunksize=chunk_rows))
+
+
+def _timestamp_chunks(reader) -> Iterator[pd.DataFrame]:
+    carry = None
+    for chunk in reader:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        complete = (chunk["timestamp"] != chunk["timestamp"].iloc[-1]).to_numpy()
+        carry = chunk[~complete]
+        if complete.any():
+            yield chunk[complete].reset_index(drop=True)
+    if carry is not None and len(carry):
+        yield carry.reset_index(drop=True)
+
+
+class _TradeCursor:
+    # trades read ahead of the prices, handed out up to a timestamp at a time
+
+    def __init__(self, chunks: Iterator[pd.DataFrame]):
+        self.chunks = chunks
+        self.pending = None
+
+    def until(self, timestamp: int) -> pd.DataFrame:
+        """Every trade not handed out yet with a timestamp up to and including timestamp."""
+        parts = []
+        while True:
+            if self.pending is None:
+                self.pending = next(self.chunks, None)
+                if self.pending is None:
+                    break
+            due = (self.pending["timestamp"] <= timestamp).to_numpy()
+            parts.append(self.pending[due])
+            if not due.all():
+                self.pending = self.pending[~due]
+                break
+            self.pending = None
+        if not parts:
+            return pd.DataFrame({column: [] for column in TRADE_COLUMNS})
+        return pd.concat(parts, ignore_index=True)
+
+
+def market_chunks(prices: Source, trades: Source = None,
+                  chunk_rows: int = CHUNK_ROWS) -> Iterator[Tuple[pd.DataFrame, CompiledPrices, CompiledTrades]]:
+    """
+    (prices rows, compiled prices, compiled trades) for consecutive chunks of one day. The trades of
+    a chunk are those printed after the previous chunk's last timestamp and up to its own; trades
+    after the day's last prices are dropped, as Backtester never hands them out either.
+    """
+    cursor = _TradeCursor(read_chunks(trades, chunk_rows) if trades is not None else iter(()))
+    for frame in read_chunks(prices, chunk_rows):
+        trade_frame = cursor.until(int(frame["timestamp"].iloc[-1]))
+        yield frame, CompiledPrices.from_dataframe(frame), CompiledTrades.from_dataframe(trade_frame)
+
+
+def run_chained(backtesters: Iterable[Backtester], summary: RunningSummary, file_name: str = None,
+                log_indent: int = 2, carry_over: bool = True) -> Iterator[Backtester]:
+    """
+    Run each backtester through all its ticks, one after the other, and yield it once it is done.
+
+    With carry_over, each starts from the CARRIED_FIELDS the previous one ended with; without it
+    every one starts afresh and its PnL is counted on top of the PnL so far. Every ledger is folded
+    into summary, and the logs go to file_name (if set) through a single SpillingLogWriter.
+    """
+    writer = SpillingLogWriter(file_name, indent=log_indent) if file_name is not None else None
+    carried = None
+    try:
+        for backtester in backtesters:
+            if carry_over and carried is not None:
+                for field in CARRIED_FIELDS:
+                    setattr(backtester, field, carried[field])
+            while backtester.tick < len(backtester.prices):
+                backtester._step()
+
+            if writer is not None:
+                backtester.write_log(writer)
+            summary.add(backtester.ledger, restart=not carry_over)
+            carried = {field: getattr(backtester, field) for field in CARRIED_FIELDS}
+            yield backtester
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class StreamingBacktester:
+    """
+    Backtester over a sequence of days read in chunks, each day given as (prices, trades) sources;
+    trades may be None. observations, if given, has one CompiledObservations (or None) per day.
+
+    Other keyword arguments (log_indent, trader_data_mode, trader_budget_ms) go to every chunk's
+    Backtester; profiling and checkpoints are not available in this mode.
+    """
+
+    def __init__(self, trader, listings: Dict[str, Listing], position_limit: Dict[str, int], fair_marks,
+                 days: List[Tuple[Source, Source]], file_name: str = None, chunk_rows: int = CHUNK_ROWS,
+                 observations: List[CompiledObservations] = None, log_indent: int = 2, **backtester_options):
+        self.trader = trader
+        self.listings = listings
+        self.position_limit = position_limit
+        self.fair_marks = fair_marks
+        self.days = list(days)
+        self.file_name = file_name
+        self.chunk_rows = chunk_rows
+        self.observations = observations if observations is not None else [None] * len(self.days)
+        self.log_indent = log_indent
+        self.backtester_options = backtester_options
+        self.summary = RunningSummary(list(listings))
+        self.ticks = 0
+
+    @classmethod
+    def from_catalog(cls, trader, listings: Dict[str, Listing], position_limit: Dict[str, int], fair_marks,
+                     round_number: int, days: List[int], data_dir: str = ".", **kwargs) -> "StreamingBacktester":
+        catalog = Catalog([data_dir])
+        sources, observations = [], []
+        for day in days:
+            trades = catalog.location(round_number, day, "trades") if catalog.has(round_number, day, "trades") else None
+            sources.append((catalog.location(round_number, day, "prices"), trades))
+            observations.append(catalog.load_observations(round_number, day)
+                                if catalog.has(round_number, day, "observations") else None)
+        return cls(trader, listings, position_limit, fair_marks, sources, observations=observations, **kwargs)
+
+    def chunks(self) -> Iterator[Tuple[pd.DataFrame, CompiledPrices, CompiledTrades, CompiledObservations]]:
+        for (prices, trades), observations in zip(self.days, self.observations):
+            for frame, compiled_prices, compiled_trades in market_chunks(prices, trades, self.chunk_rows):
+                yield frame, compiled_prices, compiled_trades, observations
+
+    def run(self) -> pd.DataFrame:
+        """Run every day, write the log file if file_name is set and return the summary of the whole run."""
+        backtesters = (Backtester(self.trader, self.listings, self.position_limit, self.fair_marks, frame, None,
+                                  prices=prices, trades=trades, observations=observations, **self.backtester_options)
+                       for frame, prices, trades, observations in self.chunks())
+        for backtester in run_chained(backtesters, self.summary, self.file_name, self.log_indent):
+            self.ticks += len(backtester.prices)
+        return self.summary.summary()
@@ -0,0 +1,160 @@
+"""
+Parameter sweeps over the constructor arguments of a Trader.
+
+Each day's prices and trades are compiled once in the parent process and copied into shared memory.
+Worker processes map those blocks instead of re-reading the CSVs for every grid point.
+
+Example:
+
+    from sweep import sweep
+
+    results = sweep("Round2:Trader", {"A_threshold": [1.0, 1.2, 1.5], "window": [1000, 3000]}, days=[-1, 0, 1])
+    print(results.head())
+"""
+
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import backtester_run
+from backtester import Backtester
+from datasets import Catalog
+from tickstream import CompiledObservations, CompiledPrices, CompiledTrades
+
+
+class SharedArrays:
+    """
+    Named arrays copied into shared memory blocks owned by the creating process.
+
+    descriptor is small and picklable; pass it to attach_arrays in another process to map the same
+    memory. The owner must call release() once no process needs the arrays any more.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.blocks = {}
+        self.descriptor = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks[name] = block
+            self.descriptor[name] = (block.name, array.shape, array.dtype.str)
+
+    def release(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+
+def attach_arrays(descriptor):
+    """Read-only views of the arrays described by a SharedArrays descriptor, plus the blocks backing them."""
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in descriptor.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+        blocks.append(block)
+    return arrays, blocks
+
+
+def share_compiled(compiled) -> Tuple[SharedArrays, Dict[str, Any]]:
+    """Move the arrays of a CompiledPrices/CompiledTrades into shared memory; returns the owner and metadata."""
+    owner = SharedArrays({field: getattr(compiled, field) for field in compiled.ARRAY_FIELDS})
+    return owner, {field: getattr(compiled, field) for field in compiled.LIST_FIELDS}
+
+
+# per worker process: day -> (CompiledPrices, CompiledTrades, CompiledObservations or None) over shared memory
+_days = {}
+_blocks = []
+
+
+def _attach_compiled(compiled_class, shared):
+    if shared is None:
+        return None
+    descriptor, meta = shared
+    arrays, blocks = attach_arrays(descriptor)
+    _blocks.extend(blocks)
+    return compiled_class(**arrays, **meta)
+
+
+def _init_worker(shared_days):
+    for day, (prices, trades, observations) in shared_days.items():
+        _days[day] = (_attach_compiled(CompiledPrices, prices), _attach_compiled(CompiledTrades, trades),
+                      _attach_compiled(CompiledObservations, observations))
+
+
+def _run_point(params, trader_factory, days, listings, position_limit, fair_marks, quiet, trader_data_mode):
+    if isinstance(trader_factory, str):
+        trader_factory = backtester_run.load_trader_class(trader_factory)
+
+    row = dict(params)
+    total = 0
+    for day in days:
+        prices, trades, observations = _days[day]
+        backtester = Backtester(trader_factory(**params), listings, position_limit, fair_marks, None, None,
+                                prices=prices, trades=trades, trader_data_mode=trader_data_mode,
+                                observations=observations)
+        with backtester_run.silenced(quiet):
+            backtester.run()
+        day_pnl = float(sum(backtester.pnl.values()))
+        row[f"day_{day}"] = day_pnl
+        total += day_pnl
+    row["total"] = total
+    return row
+
+
+def sweep(trader_factory, grid: Dict[str, List[Any]], days: List[int], round_number: int = 2,
+          data_dir: str = ".", listings=None, position_limit=None, fair_marks=None,
+          max_workers: int = None, quiet: bool = True, trader_data_mode: str = "passthrough") -> pd.DataFrame:
+    """
+    Backtest trader_factory(**params) for every point of grid on every day.
+
+    trader_factory is a Trader class (or any picklable callable returning a trader) or a strategy spec
+    as understood by backtester_run.load_trader_class. Listings, position limits and fair marks default
+    to the ones in backtester_run. traderData is passed through unencoded by default, see
+    Backtester for the other modes.
+
+    Returns one row per grid point with the parameters, the total PnL of each day and overall, ranked
+    by total PnL. Data is looked up in data_dir, a directory or data bottle zip (see datasets.Catalog).
+    """
+    listings = backtester_run.listings if listings is None else listings
+    position_limit = backtester_run.position_limit if position_limit is None else position_limit
+    fair_marks = backtester_run.fair_calculations if fair_marks is None else fair_marks
+
+    points = [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+
+    owners = []
+    try:
+        catalog = Catalog([data_dir])
+
+        def share(compiled):
+            owner, meta = share_compiled(compiled)
+            owners.append(owner)
+            return owner.descriptor, meta
+
+        shared_days = {}
+        for day in days:
+            observations = None
+            if catalog.has(round_number, day, "observations"):
+                observations = share(catalog.load_observations(round_number, day))
+            shared_days[day] = (share(catalog.load_prices(round_number, day)),
+                                share(catalog.load_trades(round_number, day)), observations)
+
+        run_point = functools.partial(_run_point, trader_factory=trader_factory, days=days, listings=listings,
+                                      position_limit=position_limit, fair_marks=fair_marks, quiet=quiet,
+                                      trader_data_mode=trader_data_mode)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shared_days,)) as executor:
+            rows = list(executor.map(run_point, points))
+    finally:
+        for owner in owners:
+            owner.release()
+
+    results = pd.DataFrame(rows).sort_values(by="total", ascending=False).reset_index(drop=True)
+    results.insert(0, "rank", np.arange(1, len(results) + 1))
+    return results
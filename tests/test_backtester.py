@@ -0,0 +1,117 @@
+import contextlib
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backtester import Backtester  # noqa: E402
+from backtester_run import listings, load_trader_class, position_limit  # noqa: E402
+from datamodel import Order  # noqa: E402
+from tickstream import CompiledObservations  # noqa: E402
+
+DATA = os.path.join(ROOT, "data", "round-1-island-data-bottle")
+
+
+def test_round1_slice_fills_are_pinned():
+    # the first 1000 ticks of round 1 day 0 with example-program.py; a change to order matching or
+    # to how trades reach the log shows up here
+    prices = pd.read_csv(os.path.join(DATA, "prices_round_1_day_0.csv"), sep=";", nrows=3000)
+    trades = pd.read_csv(os.path.join(DATA, "trades_round_1_day_0.csv"), sep=";")
+    trades = trades[trades["timestamp"] <= prices["timestamp"].max()]
+    backtester = Backtester(load_trader_class(os.path.join(ROOT, "example-program.py"))(), listings,
+                            position_limit, {}, prices, trades)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = backtester.run()
+
+    products = ["RAINFOREST_RESIN", "KELP", "SQUID_INK"]
+    assert {p: backtester.current_position[p] for p in products} == {"RAINFOREST_RESIN": -25, "KELP": 0,
+                                                                    "SQUID_INK": 12}
+    assert summary.loc[products, "pnl"].tolist() == pytest.approx([72.0, 0.0, -1269.772727272728], abs=1e-9)
+    assert summary.loc[products, "volume"].tolist() == [25, 0, 1252]
+
+    log = list(backtester.trades)
+    own = [t for t in log if "SUBMISSION" in (t["buyer"], t["seller"])]
+    assert (len(log), len(own)) == (1005, 241)
+    assert min(t["quantity"] for t in log) > 0  # no zero-volume fills
+
+
+class Recorder:
+    """Wraps a trader and keeps the timestamps of the trades it is handed on every tick."""
+
+    def __init__(self, trader):
+        self.trader = trader
+        self.handed = []
+
+    def run(self, state):
+        trades = [t for trades in (*state.own_trades.values(), *state.market_trades.values()) for t in trades]
+        self.handed.append((state.timestamp, {t.timestamp for t in trades}))
+        return self.trader.run(state)
+
+
+def test_only_the_previous_ticks_trades_are_handed_over():
+    prices = pd.read_csv(os.path.join(DATA, "prices_round_1_day_0.csv"), sep=";", nrows=600)
+    trades = pd.read_csv(os.path.join(DATA, "trades_round_1_day_0.csv"), sep=";")
+    trades = trades[trades["timestamp"] <= prices["timestamp"].max()]
+    recorder = Recorder(load_trader_class(os.path.join(ROOT, "example-program.py"))())
+    with contextlib.redirect_stdout(io.StringIO()):
+        Backtester(recorder, listings, position_limit, {}, prices, trades).run()
+    previous = None
+    for timestamp, handed in recorder.handed:
+        assert handed <= ({previous} if previous is not None else set())
+        previous = timestamp
+    assert sum(len(handed) > 0 for _, handed in recorder.handed) > 50
+
+
+class Converter:
+    """Buys 2 KELP at the best ask on the second tick and asks for conversions[i] on tick i."""
+
+    def __init__(self, conversions):
+        self.conversions = conversions
+        self.tick = 0
+
+    def run(self, state):
+        orders = {}
+        if self.tick == 1:
+            depth = state.order_depths["KELP"]
+            orders["KELP"] = [Order("KELP", min(depth.sell_orders), 2)]
+        conversions = self.conversions[self.tick] if self.tick < len(self.conversions) else 0
+        self.tick += 1
+        return orders, conversions, ""
+
+
+def test_conversions_log_only_requests_that_change_something():
+    prices = pd.read_csv(os.path.join(DATA, "prices_round_1_day_0.csv"), sep=";", nrows=30)
+    no_trades = pd.DataFrame({column: [] for column in ("timestamp", "buyer", "seller", "symbol", "currency",
+                                                         "price", "quantity")})
+    quotes = pd.DataFrame({"timestamp": [0], "bidPrice": [2000.0], "askPrice": [2002.0], "transportFees": [1.0],
+                           "exportTariff": [0.5], "importTariff": [0.5], "sugarPrice": [200.0], "sunlightIndex": [60.0]})
+    observations = CompiledObservations.from_dataframe(quotes, product="KELP")
+    # flat on tick 0, long 2 from tick 1 (orders fill before conversions), flat again after tick 2
+    backtester = Backtester(Converter([1, 1, -5, -1]), listings, position_limit, {}, prices, no_trades,
+                            observations=observations)
+    backtester.run()
+    logs = [entry["sandboxLog"] for entry in backtester.sandbox_logs]
+    assert logs[0] == ""
+    assert "ignored" in logs[1]
+    assert "reduced to -2" in logs[2]
+    assert logs[3:] == [""] * (len(logs) - 3)
+    assert backtester.current_position["KELP"] == 0
+
+
+def test_profiling_times_every_tick_without_changing_results():
+    prices = pd.read_csv(os.path.join(DATA, "prices_round_1_day_0.csv"), sep=";", nrows=600)
+    trades = pd.read_csv(os.path.join(DATA, "trades_round_1_day_0.csv"), sep=";")
+    trades = trades[trades["timestamp"] <= prices["timestamp"].max()]
+    trader_class = load_trader_class(os.path.join(ROOT, "example-program.py"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        plain = Backtester(trader_class(), listings, position_limit, {}, prices, trades)
+        profiled = Backtester(trader_class(), listings, position_limit, {}, prices, trades, profile=True)
+        pd.testing.assert_frame_equal(plain.run(), profiled.run())
+    assert plain.profiler is None
+    assert profiled.profiler.recorded.all()
+    assert (profiled.profiler.durations[:, 1] > 0).all()
@@ -0,0 +1,65 @@
+import json
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datamodel import Observation, OrderDepth, PriceLevels, ProsperityEncoder, TradingState  # noqa: E402
+
+
+def book():
+    od = OrderDepth()
+    od.buy_orders.update({9: 4, 10: 2, 8: 7})
+    od.sell_orders.update({12: -1, 11: -5})
+    return od
+
+
+def test_views_are_in_price_order_and_follow_changes():
+    od = book()
+    keys, items = od.buy_orders.keys(), od.buy_orders.items()
+    assert list(keys) == [10, 9, 8]
+    od.buy_orders[11] = 1
+    del od.buy_orders[8]
+    assert list(keys) == [11, 10, 9]
+    assert list(items) == [(11, 1), (10, 2), (9, 4)]
+    assert list(od.buy_orders.values()) == [1, 2, 4]
+    assert list(reversed(od.buy_orders)) == [9, 10, 11]
+
+
+def test_views_support_set_operations():
+    od = book()
+    assert od.buy_orders.keys() & {9, 10, 42} == {9, 10}
+    assert (10, 2) in od.buy_orders.items()
+    assert len(od.sell_orders.values()) == 2
+
+
+def test_merge_operators_keep_the_sorted_index():
+    od = book()
+    od.sell_orders |= {8: -3}
+    assert od.best_ask() == 8
+    assert list(od.sell_orders) == [8, 11, 12]
+    assert dict(od.sell_orders) == {8: -3, 11: -5, 12: -1}
+
+    merged = od.buy_orders | {12: 1}
+    assert isinstance(merged, PriceLevels) and merged.best() == 12
+    assert od.buy_orders.best() == 10
+
+
+def test_fromkeys_and_pickle():
+    levels = PriceLevels.fromkeys([3, 1, 2], 0)
+    assert list(levels) == [1, 2, 3] and levels.best() == 1
+    copy = pickle.loads(pickle.dumps(book().buy_orders))
+    assert copy.descending and list(copy.items()) == [(10, 2), (9, 4), (8, 7)]
+
+
+def test_read_only_books_serialize_like_ordinary_ones():
+    from tickstream import read_only_order_depths
+
+    state = TradingState("", 0, {}, {"KELP": book()}, {}, {}, {}, Observation({}, {}))
+    ordinary = json.loads(state.toJSON())
+    state.order_depths = read_only_order_depths(state.order_depths)
+    assert json.loads(state.toJSON()) == ordinary
+    assert ordinary["order_depths"]["KELP"] == {"buy_orders": {"10": 2, "9": 4, "8": 7},
+                                                "sell_orders": {"11": -5, "12": -1}}
+    assert json.loads(json.dumps(state.order_depths, cls=ProsperityEncoder)) == ordinary["order_depths"]
@@ -0,0 +1,57 @@
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import types
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datasets  # noqa: E402
+
+PRICES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "data", "round-1-island-data-bottle", "prices_round_1_day_0.csv")
+
+
+def _load(cache_dir):
+    datasets.CACHE_DIR = cache_dir
+    prices = datasets.load_prices(PRICES)
+    return len(prices), int(np.asarray(prices.timestamps).sum())
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_one_entry_built_by_several_processes_at_once(tmp_path):
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        for attempt in range(4):
+            cache_dir = str(tmp_path / f"cache{attempt}")
+            results = pool.map(_load, [cache_dir] * 8)
+            assert len(set(results)) == 1
+            shutil.rmtree(cache_dir)
+
+
+def test_touched_source_is_served_from_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "CACHE_DIR", str(tmp_path / "cache"))
+    source = str(tmp_path / "prices_round_1_day_0.csv")
+    shutil.copy(PRICES, source)
+    first = datasets.load_prices(source)
+    os.utime(source, ns=(0, 0))
+    second = datasets.load_prices(source)
+    assert np.array_equal(first.timestamps, second.timestamps)
+
+
+def test_cache_locks_with_msvcrt_without_fcntl(tmp_path, monkeypatch):
+    # the Windows path: fcntl does not exist there, msvcrt.locking takes its place
+    calls = []
+    msvcrt = types.SimpleNamespace(LK_LOCK=1, LK_UNLCK=0, locking=lambda fd, mode, size: calls.append(mode))
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    monkeypatch.setitem(sys.modules, "msvcrt", msvcrt)
+    monkeypatch.delitem(sys.modules, "datasets")
+    windows = importlib.import_module("datasets")
+    monkeypatch.setattr(windows, "CACHE_DIR", str(tmp_path / "cache"))
+    assert windows.fcntl is None
+    assert len(windows.load_prices(PRICES)) > 0
+    assert calls == [1, 0]
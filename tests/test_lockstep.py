@@ -0,0 +1,61 @@
+import contextlib
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtester import Backtester, LockstepBacktester  # noqa: E402
+from datamodel import Listing, Order  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "round-1-island-data-bottle")
+
+
+def market():
+    prices = pd.read_csv(os.path.join(DATA, "prices_round_1_day_0.csv"), sep=";", nrows=900)
+    trades = pd.read_csv(os.path.join(DATA, "trades_round_1_day_0.csv"), sep=";")
+    trades = trades[trades["timestamp"] <= prices["timestamp"].max()]
+    products = prices["product"].unique()
+    return prices, trades, {p: Listing(p, p, "SEASHELLS") for p in products}, {p: 50 for p in products}
+
+
+class BookEater:
+    """Takes the best ask of every product, then deletes it from the books it was given."""
+
+    def run(self, state):
+        orders = {}
+        for product, depth in state.order_depths.items():
+            if depth.sell_orders:
+                price = min(depth.sell_orders)
+                orders[product] = [Order(product, price, 1)]
+                del depth.sell_orders[price]
+        return orders, 0, ""
+
+
+class Taker:
+    """Buys one at the best ask of every product."""
+
+    def run(self, state):
+        return {product: [Order(product, min(depth.sell_orders), 1)]
+                for product, depth in state.order_depths.items() if depth.sell_orders}, 0, ""
+
+
+def test_trader_changing_its_books_does_not_affect_the_others():
+    prices, trades, listings, limits = market()
+    with contextlib.redirect_stdout(io.StringIO()):
+        separate = {name: Backtester(trader, listings, limits, {}, prices, trades).run()
+                    for name, trader in (("eater", BookEater()), ("taker", Taker()))}
+        lockstep = LockstepBacktester({"eater": BookEater(), "taker": Taker()}, listings, limits, {},
+                                      prices, trades).run()
+    for name, summary in separate.items():
+        pd.testing.assert_frame_equal(lockstep.loc[name], summary)
+
+
+def test_shared_books_are_read_only():
+    prices, trades, listings, limits = market()
+    lockstep = LockstepBacktester([BookEater()], listings, limits, {}, prices, trades, copy_books=False)
+    with pytest.raises(TypeError, match="copy_books=True"):
+        lockstep.run()
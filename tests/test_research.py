@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from research import _fill_path  # noqa: E402
+
+
+def test_nan_targets_hold_the_position():
+    nan = float("nan")
+    fills = _fill_path([nan, nan, 10, nan, -5], [100] * 5, [100] * 5, 50, targets=True)
+    assert fills == [0, 0, 10, 0, -15]
+
+
+def test_nan_quantities_send_nothing():
+    fills = _fill_path([np.nan, 3, np.nan], [100] * 3, [100] * 3, 50, targets=False)
+    assert fills == [0, 3, 0]
+
+
+def test_all_nan_targets_never_trade():
+    from research import backtest_arrays, load_market
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    market = load_market(1, 0, os.path.join(root, "data", "round-1-island-data-bottle"))
+    ledger = backtest_arrays(lambda market: {"KELP": np.full(len(market), np.nan)}, market)
+    kelp = ledger.summary().loc["KELP"]
+    assert kelp["volume"] == 0 and kelp["pnl"] == 0
@@ -0,0 +1,100 @@
+import importlib.util
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rolling import EMA, RollingWindow  # noqa: E402
+
+
+def spreads(n, seed=0):
+    # half-tick prices around a level, like the basket spreads
+    return (np.round(np.random.default_rng(seed).normal(50.0, 20.0, n) * 2) / 2 + 1e4).tolist()
+
+
+def test_window_matches_numpy_through_several_passes():
+    values = spreads(1000)
+    window = RollingWindow(64)
+    for i, value in enumerate(values):
+        window.push(value)
+        last = values[max(0, i - 63):i + 1]
+        assert len(window) == len(last)
+        assert window.full == (len(last) == 64)
+        assert window.mean == np.mean(last)
+        assert window.variance == pytest.approx(np.var(last), rel=1e-9, abs=1e-9)
+        assert window.std == pytest.approx(np.std(last), rel=1e-9, abs=1e-9)
+        assert window.last == value
+        assert window.zscore() == pytest.approx((value - np.mean(last)) / (np.std(last) + 1e-6))
+
+
+def test_wrap_around_recomputes_exactly():
+    window = RollingWindow(4)
+    for value in [1e16, 1.0, 1.0, 1.0]:
+        window.push(value)
+    # 1e16 swallows the ones in the running sum; once it has left the window the pass over the
+    # buffer recomputes everything from the values themselves
+    for _ in range(4):
+        window.push(1.0)
+    assert window.head == 0
+    assert (window.total, window.m2, window.mean, window.std) == (4.0, 0.0, 1.0, 0.0)
+
+
+def test_window_state_round_trips():
+    window = RollingWindow(16)
+    for value in spreads(40):
+        window.push(value)
+    state = json.loads(json.dumps(window.__getstate__()))
+    for copy in (RollingWindow.restore(state), pickle.loads(pickle.dumps(window))):
+        assert copy.__getstate__() == window.__getstate__()
+        assert (copy.mean, copy.std, copy.last) == (window.mean, window.std, window.last)
+
+
+def test_ema():
+    values = spreads(200)
+    with pytest.raises(ValueError):
+        EMA()
+    with pytest.raises(ValueError):
+        EMA(alpha=0.5, span=3)
+    ema = EMA(span=9)
+    assert ema.alpha == 0.2
+    assert ema.push(values[0]) == values[0]
+    expected = values[0]
+    for value in values[1:]:
+        expected += 0.2 * (value - expected)
+        assert ema.push(value) == pytest.approx(expected)
+    restored = pickle.loads(pickle.dumps(ema))
+    assert restored.__getstate__() == ema.__getstate__() == [0.2, ema.value]
+
+
+def load_trader_module(path):
+    spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3].replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("strategy", [os.path.join(ROOT, "Round2.py"), os.path.join(ROOT, "example-program.py")])
+def test_trader_copies_stay_in_step_with_rolling(strategy):
+    module = load_trader_module(strategy)
+    copy_class = module.RollingWindow
+    shared = [name for name in vars(copy_class) if not name.startswith("__") or name == "__getstate__"]
+    assert set(shared) <= set(vars(RollingWindow)), "the trader's copy has methods rolling.py does not"
+
+    original, copy = RollingWindow(50), copy_class(50)
+    for value in spreads(240, seed=1):
+        original.push(value)
+        copy.push(value)
+        assert copy.__getstate__() == original.__getstate__()
+        assert (copy.full, copy.mean) == (original.full, original.mean)
+        if "zscore" in shared:
+            assert copy.zscore() == original.zscore()
+
+    windows = module.load_windows(module.dump_windows({"spread": copy}))
+    assert windows["spread"].__getstate__() == original.__getstate__()
+    assert module.load_windows("") == {}
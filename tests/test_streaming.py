@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backtester import Backtester  # noqa: E402
+from backtester_run import listings, load_trader_class, position_limit, silenced  # noqa: E402
+from streaming import StreamingBacktester  # noqa: E402
+
+DATA = os.path.join(ROOT, "data", "round-1-island-data-bottle")
+
+
+def test_chunks_carry_over_to_the_same_result_as_one_run(tmp_path):
+    prices = pd.read_csv(os.path.join(DATA, "prices_round_1_day_0.csv"), sep=";", nrows=1500)
+    trades = pd.read_csv(os.path.join(DATA, "trades_round_1_day_0.csv"), sep=";")
+    trades = trades[trades["timestamp"] <= prices["timestamp"].max()]
+    prices_path, trades_path = str(tmp_path / "prices.csv"), str(tmp_path / "trades.csv")
+    prices.to_csv(prices_path, sep=";", index=False)
+    trades.to_csv(trades_path, sep=";", index=False)
+    trader_class = load_trader_class(os.path.join(ROOT, "example-program.py"))
+    round1 = {product: listings[product] for product in prices["product"].unique()}
+
+    with silenced():
+        whole = Backtester(trader_class(), round1, position_limit, {}, prices, trades, str(tmp_path / "whole.log"))
+        expected = whole.run()
+        streaming = StreamingBacktester(trader_class(), round1, position_limit, {}, [(prices_path, trades_path)],
+                                        str(tmp_path / "streamed.log"), chunk_rows=211)
+        summary = streaming.run()
+
+    assert streaming.ticks == len(whole.prices)
+    pd.testing.assert_frame_equal(summary, expected, atol=1e-6)
+    with open(tmp_path / "whole.log") as a, open(tmp_path / "streamed.log") as b:
+        assert a.read() == b.read()
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import os
+import sys
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backtester import Backtester  # noqa: E402
+from backtester_run import load_trader_class  # noqa: E402
+from datamodel import Listing  # noqa: E402
+
+
+def round2_slice(rows=1200):
+    with zipfile.ZipFile(os.path.join(ROOT, "round-2-island-data-bottle.zip")) as archive:
+        with archive.open("round-2-island-data-bottle/prices_round_2_day_0.csv") as file:
+            prices = pd.read_csv(file, sep=";", nrows=rows)
+        with archive.open("round-2-island-data-bottle/trades_round_2_day_0.csv") as file:
+            trades = pd.read_csv(file, sep=";")
+    return prices, trades[trades["timestamp"] <= prices["timestamp"].max()]
+
+
+def make_backtester(trader, prices, trades):
+    products = prices["product"].unique()
+    return Backtester(trader, {p: Listing(p, p, "SEASHELLS") for p in products}, {p: 50 for p in products}, {},
+                      prices, trades, trader_data_mode="fidelity")
+
+
+def test_fidelity_mode_times_the_traders_own_serialisation():
+    prices, trades = round2_slice()
+    backtester = make_backtester(load_trader_class("Round2")(), prices, trades)
+    with contextlib.redirect_stdout(io.StringIO()):
+        backtester.run()
+    report = backtester.trader_data_report()
+    assert list(report.columns) == ["timestamp", "bytes", "encode_time", "decode_time"]
+    assert len(report) == prices["timestamp"].nunique()
+    assert np.isfinite(report[["encode_time", "decode_time"]].to_numpy()).all()
+    assert (report["bytes"] > 0).all()
+
+
+class PlainTrader:
+    """Returns a string traderData with no hooks, so only its size can be recorded."""
+
+    def run(self, state):
+        return {}, 0, "x" * 10
+
+
+def test_untimed_serialisation_leaves_out_the_time_columns():
+    prices, trades = round2_slice(60)
+    backtester = make_backtester(PlainTrader(), prices, trades)
+    backtester.run()
+    assert list(backtester.trader_data_report().columns) == ["timestamp", "bytes"]
@@ -0,0 +1,378 @@
+"""
+Columnar tick stream for the backtester.
+
+A prices file (prices_round_N_day_D.csv) is compiled once into NumPy arrays, and OrderDepth objects
+are then built per timestamp straight from those arrays instead of re-walking pandas rows.
+
+Example:
+
+    prices = CompiledPrices.from_csv("data/round-1-island-data-bottle/prices_round_1_day_0.csv")
+    for timestamp, order_depths in prices.ticks():
+        ...
+"""
+
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from datamodel import ConversionObservation, Observation, OrderDepth, PriceLevels, Trade
+
+LEVELS = 3
+
+# the product that conversion observations (observations_round_N_day_D.csv) are about
+CONVERSION_PRODUCT = "MAGNIFICENT_MACARONS"
+CONVERSION_FIELDS = ("bidPrice", "askPrice", "transportFees", "exportTariff", "importTariff",
+                     "sugarPrice", "sunlightIndex")
+
+
+class CompiledPrices:
+    """
+    Book levels of a prices DataFrame as arrays, one row per (timestamp, product).
+
+    Rows are stably sorted by timestamp, so rows of the same tick keep the order they had in the
+    source file. Empty levels (blank in the CSV) are False in bid_valid/ask_valid.
+    """
+
+    # constructor arguments, split by kind so the arrays can be moved into shared memory
+    ARRAY_FIELDS = ("timestamps", "product_ids", "bid_prices", "bid_volumes", "bid_valid",
+                    "ask_prices", "ask_volumes", "ask_valid", "row_index")
+    LIST_FIELDS = ("products",)
+
+    def __init__(self, timestamps: np.ndarray, product_ids: np.ndarray, products: List[str],
+                 bid_prices: np.ndarray, bid_volumes: np.ndarray, bid_valid: np.ndarray,
+                 ask_prices: np.ndarray, ask_volumes: np.ndarray, ask_valid: np.ndarray,
+                 row_index: np.ndarray):
+        self.timestamps = timestamps
+        self.product_ids = product_ids
+        self.products = products
+        self.bid_prices = bid_prices
+        self.bid_volumes = bid_volumes
+        self.bid_valid = bid_valid
+        self.ask_prices = ask_prices
+        self.ask_volumes = ask_volumes
+        self.ask_valid = ask_valid
+        # position of each compiled row in the source DataFrame
+        self.row_index = row_index
+
+        boundaries = np.flatnonzero(np.diff(timestamps)) + 1
+        self.tick_starts = np.concatenate(([0], boundaries, [len(timestamps)])).astype(np.int64)
+        if len(timestamps) == 0:
+            self.tick_starts = np.zeros(1, dtype=np.int64)
+        self.tick_timestamps = timestamps[self.tick_starts[:-1]]
+
+        self._levels = None
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "CompiledPrices":
+        order = np.argsort(df["timestamp"].to_numpy(), kind="stable")
+        timestamps = df["timestamp"].to_numpy(dtype=np.int64)[order]
+
+        codes, products = pd.factorize(df["product"])
+        product_ids = codes.astype(np.int32)[order]
+
+        def side(prefix):
+            prices = np.zeros((len(df), LEVELS), dtype=np.int64)
+            volumes = np.zeros((len(df), LEVELS), dtype=np.int64)
+            valid = np.zeros((len(df), LEVELS), dtype=bool)
+            for i in range(LEVELS):
+                price_col, volume_col = f"{prefix}_price_{i + 1}", f"{prefix}_volume_{i + 1}"
+                if price_col not in df or volume_col not in df:
+                    continue
+                price = df[price_col].to_numpy(dtype=np.float64)
+                volume = df[volume_col].to_numpy(dtype=np.float64)
+                valid[:, i] = ~np.isnan(price) & ~np.isnan(volume)
+                prices[valid[:, i], i] = price[valid[:, i]]
+                volumes[valid[:, i], i] = np.abs(volume[valid[:, i]])
+            return prices[order], volumes[order], valid[order]
+
+        bid_prices, bid_volumes, bid_valid = side("bid")
+        ask_prices, ask_volumes, ask_valid = side("ask")
+        return cls(timestamps, product_ids, list(products), bid_prices, bid_volumes, bid_valid,
+                   ask_prices, ask_volumes, ask_valid, order.astype(np.int64))
+
+    @classmethod
+    def from_csv(cls, path: str, sep: str = ";") -> "CompiledPrices":
+        return cls.from_dataframe(pd.read_csv(path, sep=sep, header=0))
+
+    def __len__(self) -> int:
+        """Number of ticks (distinct timestamps)."""
+        return len(self.tick_starts) - 1
+
+    def tick_at(self, timestamp: int) -> int:
+        """Index of the first tick at or after timestamp."""
+        return int(np.searchsorted(self.tick_timestamps, timestamp))
+
+    def tick_products(self, tick: int) -> List[str]:
+        start, end = self.tick_starts[tick], self.tick_starts[tick + 1]
+        return [self.products[i] for i in self.product_ids[start:end].tolist()]
+
+    def _row_levels(self) -> List[Tuple[str, List[Tuple[int, int]], List[Tuple[int, int]]]]:
+        # Python-level (product, bids, asks) per row, built once on first use so that building a
+        # book is only dict construction
+        if self._levels is None:
+            names = [self.products[i] for i in self.product_ids.tolist()]
+            bid_prices, bid_volumes = self.bid_prices.tolist(), self.bid_volumes.tolist()
+            ask_prices, ask_volumes = self.ask_prices.tolist(), self.ask_volumes.tolist()
+            bid_valid, ask_valid = self.bid_valid.tolist(), self.ask_valid.tolist()
+            self._levels = [
+                (name,
+                 [(p, v) for p, v, ok in zip(bp, bv, bok) if ok],
+                 [(p, -v) for p, v, ok in zip(ap, av, aok) if ok])
+                for name, bp, bv, bok, ap, av, aok in zip(names, bid_prices, bid_volumes, bid_valid,
+                                                          ask_prices, ask_volumes, ask_valid)
+            ]
+        return self._levels
+
+    def order_depths(self, tick: int) -> Dict[str, OrderDepth]:
+        levels = self._row_levels()
+        order_depths = {}
+        for product, bids, asks in levels[self.tick_starts[tick]:self.tick_starts[tick + 1]]:
+            order_depth = OrderDepth()
+            order_depth.buy_orders.update(bids)
+            order_depth.sell_orders.update(asks)
+            order_depths[product] = order_depth
+        return order_depths
+
+    def ticks(self) -> Iterator[Tuple[int, Dict[str, OrderDepth]]]:
+        for tick, timestamp in enumerate(self.tick_timestamps.tolist()):
+            yield timestamp, self.order_depths(tick)
+
+
+def copy_order_depths(order_depths: Dict[str, OrderDepth]) -> Dict[str, OrderDepth]:
+    """Independent copy of a set of books, e.g. for matching or marking after the trader has seen them."""
+    copies = {}
+    for product, order_depth in order_depths.items():
+        copy = OrderDepth()
+        copy.buy_orders = order_depth.buy_orders.copy()
+        copy.sell_orders = order_depth.sell_orders.copy()
+        copies[product] = copy
+    return copies
+
+
+class BookCopies(dict):
+    """
+    Copies of a set of books, each made the first time its product is looked up.
+
+    For matching, where only the books of products the trader sent orders for get changed.
+    """
+
+    def __init__(self, order_depths: Dict[str, OrderDepth]):
+        super().__init__()
+        self.source = order_depths
+
+    def __missing__(self, product: str) -> OrderDepth:
+        order_depth = self.source[product]
+        copy = OrderDepth()
+        copy.buy_orders = order_depth.buy_orders.copy()
+        copy.sell_orders = order_depth.sell_orders.copy()
+        self[product] = copy
+        return copy
+
+
+SHARED_BOOK_ERROR = ("order books are shared between the traders of a LockstepBacktester and cannot be changed; "
+                     "pass copy_books=True to give every trader its own copy")
+
+
+class ReadOnlyPriceLevels(PriceLevels):
+    """PriceLevels that raise on every change; copy() gives an ordinary, changeable PriceLevels."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(SHARED_BOOK_ERROR)
+
+    __setitem__ = __delitem__ = __ior__ = pop = popitem = setdefault = update = clear = _read_only
+
+    def copy(self) -> PriceLevels:
+        levels = PriceLevels(descending=self.descending)
+        dict.update(levels, dict.items(self))
+        levels._prices = self._prices.copy()
+        return levels
+
+    def __reduce__(self):
+        return PriceLevels, (dict(self.items()), self.descending)
+
+
+class ReadOnlyOrderDepth(OrderDepth):
+    """An OrderDepth whose sides are ReadOnlyPriceLevels and cannot be replaced."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise TypeError(SHARED_BOOK_ERROR)
+
+
+def _read_only_levels(levels: PriceLevels) -> ReadOnlyPriceLevels:
+    frozen = ReadOnlyPriceLevels.__new__(ReadOnlyPriceLevels)
+    dict.update(frozen, dict.items(levels))
+    frozen._prices = levels._prices.copy()
+    frozen.descending = levels.descending
+    return frozen
+
+
+def read_only_order_depths(order_depths: Dict[str, OrderDepth]) -> Dict[str, OrderDepth]:
+    """Read-only versions of a set of books, for handing one set to several traders."""
+    books = {}
+    for product, order_depth in order_depths.items():
+        book = ReadOnlyOrderDepth.__new__(ReadOnlyOrderDepth)
+        object.__setattr__(book, "buy_orders", _read_only_levels(order_depth.buy_orders))
+        object.__setattr__(book, "sell_orders", _read_only_levels(order_depth.sell_orders))
+        books[product] = book
+    return books
+
+
+class CompiledTrades:
+    """
+    A trades file (trades_round_N_day_D.csv) as arrays, sorted by timestamp then symbol.
+
+    Symbols and counterparties are stored as ids into the symbols / names lists; a missing buyer or
+    seller is the empty name "".
+    """
+
+    ARRAY_FIELDS = ("timestamps", "symbol_ids", "prices", "quantities", "buyer_ids", "seller_ids")
+    LIST_FIELDS = ("symbols", "names")
+
+    def __init__(self, timestamps: np.ndarray, symbol_ids: np.ndarray, symbols: List[str],
+                 prices: np.ndarray, quantities: np.ndarray,
+                 buyer_ids: np.ndarray, seller_ids: np.ndarray, names: List[str]):
+        self.timestamps = timestamps
+        self.symbol_ids = symbol_ids
+        self.symbols = symbols
+        self.prices = prices
+        self.quantities = quantities
+        self.buyer_ids = buyer_ids
+        self.seller_ids = seller_ids
+        self.names = names
+
+        self._symbol_bounds = None
+        self._timestamp_bounds = None
+        self._columns = None
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "CompiledTrades":
+        symbol_codes, symbols = pd.factorize(df["symbol"], sort=True)
+        timestamps = df["timestamp"].to_numpy(dtype=np.int64)
+        order = np.lexsort((symbol_codes, timestamps))
+
+        counterparties = pd.concat([df["buyer"], df["seller"]], ignore_index=True).fillna("").astype(str)
+        name_codes, names = pd.factorize(counterparties)
+        buyer_ids, seller_ids = name_codes[:len(df)], name_codes[len(df):]
+
+        return cls(timestamps[order], symbol_codes.astype(np.int32)[order], list(symbols),
+                   df["price"].to_numpy(dtype=np.float64).astype(np.int64)[order],
+                   df["quantity"].to_numpy(dtype=np.float64).astype(np.int64)[order],
+                   buyer_ids.astype(np.int32)[order], seller_ids.astype(np.int32)[order], list(names))
+
+    @classmethod
+    def from_csv(cls, path: str, sep: str = ";") -> "CompiledTrades":
+        return cls.from_dataframe(pd.read_csv(path, sep=sep, header=0))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def _build_index(self):
+        # rows are sorted by (timestamp, symbol), so every group is a contiguous run of rows
+        n = len(self.timestamps)
+        timestamp_change = np.diff(self.timestamps) != 0
+        group_change = timestamp_change | (np.diff(self.symbol_ids) != 0)
+
+        def runs(changes):
+            starts = np.concatenate(([0], np.flatnonzero(changes) + 1)) if n else np.zeros(0, dtype=np.int64)
+            ends = np.concatenate((starts[1:], [n])) if n else starts
+            return starts, list(zip(starts.tolist(), ends.tolist()))
+
+        starts, bounds = runs(group_change)
+        symbols = [self.symbols[i] for i in self.symbol_ids[starts].tolist()]
+        self._symbol_bounds = dict(zip(zip(self.timestamps[starts].tolist(), symbols), bounds))
+        starts, bounds = runs(timestamp_change)
+        self._timestamp_bounds = dict(zip(self.timestamps[starts].tolist(), bounds))
+
+    def rows_for(self, timestamp: int, symbol: str = None) -> range:
+        """Rows of the prints at timestamp, optionally only those of symbol."""
+        if self._symbol_bounds is None:
+            self._build_index()
+        if symbol is None:
+            bounds = self._timestamp_bounds.get(timestamp)
+        else:
+            bounds = self._symbol_bounds.get((timestamp, symbol))
+        return range(*bounds) if bounds else range(0)
+
+    def columns(self) -> Tuple[list, list, list, list]:
+        """(symbols, prices, buyers, sellers) per row as Python lists, for fast per-row access."""
+        if self._columns is None:
+            self._columns = ([self.symbols[i] for i in self.symbol_ids.tolist()], self.prices.tolist(),
+                             [self.names[i] for i in self.buyer_ids.tolist()],
+                             [self.names[i] for i in self.seller_ids.tolist()])
+        return self._columns
+
+    def trade(self, row: int, quantity: int = None) -> Trade:
+        """The print at row as a Trade, with quantity overriding its volume (e.g. what is left of it)."""
+        symbols, prices, buyers, sellers = self.columns()
+        if quantity is None:
+            quantity = int(self.quantities[row])
+        return Trade(symbols[row], prices[row], quantity, buyers[row], sellers[row], int(self.timestamps[row]))
+
+
+class CompiledObservations:
+    """
+    An observations file (observations_round_N_day_D.csv) as one float column per field, sorted by
+    timestamp.
+
+    The ConversionObservation fields are reported for product; any other column (except day) is a
+    plain value observation under its column name. observation(timestamp) builds the Observation
+    of a single timestamp on demand.
+    """
+
+    ARRAY_FIELDS = ("timestamps", "values")
+    LIST_FIELDS = ("columns", "product")
+
+    def __init__(self, timestamps: np.ndarray, values: np.ndarray, columns: List[str],
+                 product: str = CONVERSION_PRODUCT):
+        self.timestamps = timestamps
+        self.values = values
+        self.columns = columns
+        self.product = product
+        self._conversion_columns = [columns.index(field) for field in CONVERSION_FIELDS if field in columns]
+        if 0 < len(self._conversion_columns) < len(CONVERSION_FIELDS):
+            missing = [field for field in CONVERSION_FIELDS if field not in columns]
+            raise ValueError(f"observations have conversion fields but not {missing}")
+        self._plain_columns = [(column, i) for i, column in enumerate(columns) if column not in CONVERSION_FIELDS]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, product: str = CONVERSION_PRODUCT) -> "CompiledObservations":
+        df = df.sort_values("timestamp", kind="stable")
+        columns = [column for column in df.columns if column not in ("timestamp", "day")]
+        return cls(df["timestamp"].to_numpy(dtype=np.int64), df[columns].to_numpy(dtype=np.float64).reshape(len(df), -1),
+                   columns, product)
+
+    @classmethod
+    def from_csv(cls, path: str, sep: str = None, product: str = CONVERSION_PRODUCT) -> "CompiledObservations":
+        # the observation files have been published both comma and semicolon separated
+        return cls.from_dataframe(pd.read_csv(path, sep=sep, engine="python" if sep is None else "c", header=0),
+                                  product)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def row_at(self, timestamp: int) -> int:
+        """Row of the latest observation at or before timestamp, or -1 if there is none."""
+        return int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1
+
+    def observation(self, timestamp: int) -> Observation:
+        row = self.row_at(timestamp)
+        if row < 0:
+            return Observation({}, {})
+        values = self.values[row].tolist()
+        plain = {column: values[i] for column, i in self._plain_columns}
+        conversion = {}
+        if self._conversion_columns:
+            conversion[self.product] = ConversionObservation(*(values[i] for i in self._conversion_columns))
+        return Observation(plain, conversion)
+
+
+def shift_timestamps(compiled, offset: int):
+    """A copy of a CompiledPrices, CompiledTrades or CompiledObservations with offset added to its timestamps."""
+    fields = {field: getattr(compiled, field) for field in compiled.ARRAY_FIELDS + compiled.LIST_FIELDS}
+    fields["timestamps"] = compiled.timestamps + offset
+    return type(compiled)(**fields)